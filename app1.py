@@ -1,22 +1,27 @@
 import eventlet
 eventlet.monkey_patch()  # Allows WebSockets to work smoothly
+from eventlet import tpool
 
 from flask import Flask
 from flask_socketio import SocketIO
 from flask_cors import CORS
 import threading
 import time
+import os
 
 # Import our modules
 import db
 import detection
+import detection_workers
 import routes
 import socket_handlers
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
-socketio = SocketIO(app, cors_allowed_origins="*")  # Enable WebSockets
+# Enable WebSockets - with SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0) set, several
+# server processes behind a sticky load balancer share one event bus, so emits reach the right client
+socketio = SocketIO(app, cors_allowed_origins="*", message_queue=os.environ.get('SOCKETIO_MESSAGE_QUEUE'))
 
 # Initialize database
 db.init_db()
@@ -31,33 +36,33 @@ routes.register_routes(app)
 # Register Socket.IO event handlers
 socket_handlers.register_socket_handlers(socketio, app)
 
+# Start sharded detection worker processes (DETECTION_WORKERS > 0), or load the
+# detection models on an OS thread - either way the API answers right away and
+# /api/ready reports when detection is warm
+if detection_workers.enabled():
+    socketio.start_background_task(detection_workers.start_workers)
+else:
+    socketio.start_background_task(tpool.execute, detection.load_models)
+
+# Stale session sweep: how often to run, and how long a session may stay open (seconds)
+SESSION_SWEEP_INTERVAL = int(os.environ.get('SESSION_SWEEP_INTERVAL', 5 * 60))
+SESSION_MAX_AGE = int(os.environ.get('SESSION_MAX_AGE', 30 * 60))
+
 # Background task to clean up stale sessions
 def cleanup_stale_sessions():
-    """Background task to close any open sessions that are too old (> 30 minutes)"""
+    """Background task to close any open sessions older than SESSION_MAX_AGE"""
     while True:
         try:
             print("🧹 Checking for stale sessions...")
-            open_sessions = db.get_open_sessions()
+            closed_sessions = db.close_stale_sessions(SESSION_MAX_AGE)
             
-            if open_sessions:
-                for session_id in open_sessions:
-                    # Check if session is too old
-                    session_info = db.get_session_info(session_id)
-                    if session_info and 'start_time' in session_info:
-                        # Close sessions that have been open for more than 30 minutes
-                        session_age = db.get_session_age(session_id)
-                        if session_age > 30 * 60:  # 30 minutes in seconds
-                            print(f"Closing stale session {session_id[:8]} (age: {session_age/60:.1f} minutes)")
-                            db.end_session(session_id)
-                
-                # Clear current session if it's stale
-                current_session_id = app.config.get('CURRENT_SESSION_ID', '')
-                if current_session_id and current_session_id in open_sessions:
-                    # If the current session was closed, clear it from app config
-                    app.config['CURRENT_SESSION_ID'] = ''
+            # Clear the current session only if it was one of those closed
+            current_session_id = app.config.get('CURRENT_SESSION_ID', '')
+            if current_session_id and current_session_id in closed_sessions:
+                app.config['CURRENT_SESSION_ID'] = ''
             
-            # Sleep for 5 minutes before checking again
-            time.sleep(5 * 60)
+            # Sleep before checking again
+            time.sleep(SESSION_SWEEP_INTERVAL)
         except Exception as e:
             print(f"❌ Error in cleanup task: {e}")
             time.sleep(60)  # Sleep for 1 minute if there's an error
@@ -1,11 +1,123 @@
+import os
+import time
+import json
+import hmac
+import base64
 import hashlib
 import secrets
-import sqlite3
+import threading
 from functools import wraps
 from flask import request, jsonify
+from db import get_connection
+from cache import QueryCache
+import passwords
 
-# Database file
-DATABASE_FILE = "drowsiness_logs.db"
+# Key signing the auth tokens - set AUTH_SECRET_KEY so tokens survive restarts and
+# are accepted by every server process
+AUTH_SECRET_KEY = os.environ.get('AUTH_SECRET_KEY', '')
+if not AUTH_SECRET_KEY:
+    print("⚠️ AUTH_SECRET_KEY not set - using a random key, tokens will not survive a restart")
+    AUTH_SECRET_KEY = secrets.token_hex(32)
+
+# Token lifetime in seconds
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 12 * 60 * 60))
+
+# Whether a token's user still exists, cached so valid tokens never touch the database
+user_cache = QueryCache(ttl=60, max_size=1024)
+
+# Revoked token IDs (jti) of this process -> expiry time, dropped once the token expires
+revoked_tokens = {}
+_revoked_lock = threading.Lock()
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+def _sign(payload):
+    return _b64encode(hmac.new(AUTH_SECRET_KEY.encode(), payload.encode(), hashlib.sha256).digest())
+
+def issue_token(user):
+    """
+    Issue a signed, expiring token for a logged-in user
+    
+    Returns:
+        tuple: (token string, expiry as a Unix timestamp)
+    """
+    expires_at = int(time.time()) + AUTH_TOKEN_TTL
+    claims = {
+        'uid': user['id'],
+        'usr': user['username'],
+        'exp': expires_at,
+        'jti': secrets.token_hex(8)
+    }
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    return f"{payload}.{_sign(payload)}", expires_at
+
+def verify_token(token):
+    """Get the claims of a token with a valid signature that has not expired, else None"""
+    try:
+        payload, signature = token.split('.')
+    except (AttributeError, ValueError):
+        return None
+    
+    # Compare bytes - compare_digest raises TypeError for non-ASCII str
+    try:
+        if not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+            return None
+    except UnicodeEncodeError:
+        return None
+    
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    
+    if claims.get('exp', 0) < time.time():
+        return None
+    return claims
+
+def revoke_token(token):
+    """Revoke a token before it expires (logout)"""
+    claims = verify_token(token)
+    if not claims:
+        return False
+    
+    now = time.time()
+    with _revoked_lock:
+        # Forget revocations of tokens that have expired anyway
+        for jti in [jti for jti, exp in revoked_tokens.items() if exp < now]:
+            del revoked_tokens[jti]
+        revoked_tokens[claims['jti']] = claims['exp']
+    return True
+
+@user_cache.cached
+def user_exists(user_id):
+    """Check that a user still exists (cached)"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM users WHERE id = ?", (user_id,))
+        return cursor.fetchone() is not None
+
+def token_from_header(auth_header):
+    """Extract the token from an 'Authorization: Bearer <token>' header value"""
+    if not auth_header:
+        return None
+    scheme, _, token = auth_header.partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' and token else None
+
+def authenticate(auth_header):
+    """Get the user ID for an Authorization header value, or None if it is not valid"""
+    claims = verify_token(token_from_header(auth_header))
+    if not claims:
+        return None
+    
+    with _revoked_lock:
+        if claims['jti'] in revoked_tokens:
+            return None
+    
+    return claims['uid'] if user_exists(claims['uid']) else None
 
 def require_auth(f):
     """Middleware to check for authentication"""
@@ -16,15 +128,8 @@ def require_auth(f):
         if not auth_header:
             return jsonify({'message': 'Authentication required'}), 401
             
-        # In a production environment, you should use JWT tokens or sessions
-        # For simplicity, we'll use basic authentication here
         try:
-            username = auth_header
-            conn = sqlite3.connect(DATABASE_FILE)
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-            user = cursor.fetchone()
-            conn.close()
+            user = authenticate(auth_header)
             
             if not user:
                 return jsonify({'message': 'Invalid authentication'}), 401
@@ -39,33 +144,28 @@ def require_auth(f):
 def register_user(username, password):
     """Register a new user"""
     try:
-        # Generate a random salt
-        salt = secrets.token_hex(16)
-        
-        # Hash the password with the salt
-        password_hash = hashlib.sha256((password + salt).encode()).hexdigest()
-        
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        # Check if username already exists
-        cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-        if cursor.fetchone():
-            conn.close()
-            return None, "Username already exists"
-        
-        # Insert new user
-        cursor.execute(
-            "INSERT INTO users (username, password_hash, salt) VALUES (?, ?, ?)",
-            (username, password_hash, salt)
-        )
-        
-        conn.commit()
-        
-        # Get the newly created user
-        cursor.execute("SELECT id, username, created_at FROM users WHERE username = ?", (username,))
-        user_data = cursor.fetchone()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Check if username already exists
+            cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+            if cursor.fetchone():
+                return None, "Username already exists"
+            
+            # Hash the password with a random salt (off the event loop)
+            password_hash, salt = passwords.hash_password(password)
+            
+            # Insert new user
+            cursor.execute(
+                "INSERT INTO users (username, password_hash, salt) VALUES (?, ?, ?)",
+                (username, password_hash, salt)
+            )
+            
+            conn.commit()
+            
+            # Get the newly created user
+            cursor.execute("SELECT id, username, created_at FROM users WHERE username = ?", (username,))
+            user_data = cursor.fetchone()
         
         if not user_data:
             return None, "User registration failed"
@@ -86,25 +186,33 @@ def register_user(username, password):
 def login_user(username, password):
     """Authenticate a user"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Get user data
-        cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-        user = cursor.fetchone()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Get user data
+            cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
+            user = cursor.fetchone()
         
         if not user:
-            conn.close()
+            # Same cost as a wrong password, so usernames can't be probed by timing
+            passwords.verify_dummy(password)
             return None, "Invalid username or password"
         
-        # Verify password
-        password_hash = hashlib.sha256((password + user['salt']).encode()).hexdigest()
-        
-        if password_hash != user['password_hash']:
-            conn.close()
+        # Verify password (off the event loop)
+        if not passwords.verify_password(password, user['password_hash'], user['salt']):
             return None, "Invalid username or password"
         
+        # Upgrade legacy SHA-256 hashes and outdated cost settings now that we know the password
+        if passwords.needs_rehash(user['password_hash']):
+            password_hash, salt = passwords.hash_password(password)
+            with get_connection() as conn:
+                conn.execute(
+                    "UPDATE users SET password_hash = ?, salt = ? WHERE id = ?",
+                    (password_hash, salt, user['id'])
+                )
+                conn.commit()
+            print(f"🔐 Rehashed password for user {user['username']}")
+        
         # Create user object to return
         user_data = {
             'id': user['id'],
@@ -112,7 +220,6 @@ def login_user(username, password):
             'created_at': user['created_at']
         }
         
-        conn.close()
         return user_data, None
         
     except Exception as e:
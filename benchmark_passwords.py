@@ -0,0 +1,61 @@
+"""
+Benchmark password verification at different cost settings
+
+Shows how many logins per second one server can verify at each setting, both on a
+single thread and spread over a thread pool (like eventlet.tpool in the server).
+Pick the highest cost that still covers your peak login rate.
+
+Usage: python benchmark_passwords.py [logins per setting] [threads]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import passwords
+
+# (label, algorithm, params) - the legacy hash is only included for comparison
+SETTINGS = [
+    ("sha256 (legacy)", 'sha256', ()),
+    ("pbkdf2 100k", 'pbkdf2', (100000,)),
+    ("pbkdf2 300k", 'pbkdf2', (300000,)),
+    ("pbkdf2 600k", 'pbkdf2', (600000,)),
+    ("scrypt N=2^12", 'scrypt', (2 ** 12, 8, 1)),
+    ("scrypt N=2^14", 'scrypt', (2 ** 14, 8, 1)),
+    ("scrypt N=2^15", 'scrypt', (2 ** 15, 8, 1)),
+]
+
+def make_hash(password, algorithm, params):
+    """Build a stored hash (and salt) for a setting, including the legacy format"""
+    if algorithm == 'sha256':
+        salt = "benchmarksalt"
+        return passwords.derive(password, salt, algorithm, params), salt
+    return passwords.hash_password_sync(password, algorithm, params)
+
+def benchmark(algorithm, params, logins, threads):
+    """Time `logins` verifications sequentially and on a thread pool"""
+    password = "correct horse battery staple"
+    encoded, salt = make_hash(password, algorithm, params)
+    assert passwords.verify_password_sync(password, encoded, salt)
+
+    start = time.perf_counter()
+    for _ in range(logins):
+        passwords.verify_password_sync(password, encoded, salt)
+    sequential = time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda _: passwords.verify_password_sync(password, encoded, salt), range(logins)))
+        pooled = time.perf_counter() - start
+
+    return sequential / logins * 1000, logins / sequential, logins / pooled
+
+if __name__ == '__main__':
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    print(f"Verifying {logins} logins per setting, pool of {threads} threads\n")
+    print(f"{'setting':<18}{'ms/login':>10}{'logins/s':>12}{f'logins/s ({threads} thr)':>22}")
+    for label, algorithm, params in SETTINGS:
+        ms_per_login, per_second, pooled_per_second = benchmark(algorithm, params, logins, threads)
+        print(f"{label:<18}{ms_per_login:>10.2f}{per_second:>12.1f}{pooled_per_second:>22.1f}")
+
+    print(f"\nConfigured: {passwords.PASSWORD_HASH_ALGORITHM} {passwords.current_params()}")
@@ -0,0 +1,93 @@
+import os
+import time
+import threading
+import functools
+from collections import OrderedDict
+
+# Seconds a cached query result stays valid, and how many results are kept
+QUERY_CACHE_TTL = float(os.environ.get('QUERY_CACHE_TTL', 5.0))
+QUERY_CACHE_SIZE = int(os.environ.get('QUERY_CACHE_SIZE', 128))
+
+class QueryCache:
+    """
+    In-process TTL + LRU cache for read query results
+
+    Entries expire after `ttl` seconds, the least recently used entry is evicted
+    once `max_size` is reached, and invalidate() drops everything after a write.
+    Cached results are shared between callers - treat them as read-only
+    """
+
+    def __init__(self, ttl=QUERY_CACHE_TTL, max_size=QUERY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._generation = 0           # Bumped by every invalidation
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get (True, value) for a live entry, or (False, None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value, generation=None):
+        """
+        Store a value, unless the cache was invalidated since `generation`
+        (a result read before a write committed must not outlive that write)
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self.invalidations += 1
+
+    def cached(self, fn):
+        """Decorator caching `fn` by its arguments; None results are not cached"""
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            found, value = self.get(key)
+            if found:
+                return value
+
+            generation = self._generation
+            value = fn(*args, **kwargs)
+            if value is not None:
+                self.set(key, value, generation)
+            return value
+
+        return wrapper
+
+    def stats(self):
+        """Hit/miss counters for status reporting"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl,
+                "max_size": self.max_size
+            }
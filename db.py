@@ -1,55 +1,191 @@
-import sqlite3
+import base64
 import datetime
 from datetime import datetime, timedelta
 import uuid
 import os
-import tensorflow as tf
+import db_pool
+from event_writer import EventWriter
+from cache import QueryCache
 
 # Database setup - use absolute path that works in ephemeral environments
 DATABASE_DIR = os.environ.get('DATABASE_DIR', os.path.dirname(os.path.abspath(__file__)))
 DATABASE_FILE = os.path.join(DATABASE_DIR, "drowsiness_logs.db")
 
+# Dashboard read queries are cached between writes; every write invalidates
+query_cache = QueryCache()
+
+# Callbacks told about every committed write, e.g. to push dashboard updates
+change_listeners = []
+
+# Schema migrations, applied in order on startup and tracked with PRAGMA user_version
+MIGRATIONS = [
+    # 1: Indexes for time-range filters, per-session lookups and open-session sweeps
+    [
+        "CREATE INDEX IF NOT EXISTS idx_events_timestamp ON drowsiness_events(timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_events_session_id ON drowsiness_events(session_id)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_start_time ON sessions(start_time)",
+        # Open sessions are always end_time IS NULL from now on, so the partial index covers them
+        "UPDATE sessions SET end_time = NULL WHERE end_time = ''",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_open ON sessions(start_time) WHERE end_time IS NULL",
+    ],
+    # 2: Daily rollup kept up to date with every event insert and session end
+    [
+        """
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            day TEXT PRIMARY KEY,
+            events INTEGER NOT NULL DEFAULT 0,
+            total_duration REAL NOT NULL DEFAULT 0,
+            first_event DATETIME,
+            last_event DATETIME,
+            session_time REAL NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        INSERT INTO daily_stats (day, events, total_duration, first_event, last_event)
+        SELECT substr(timestamp, 1, 10), COUNT(*), COALESCE(SUM(duration_seconds), 0), MIN(timestamp), MAX(timestamp)
+        FROM drowsiness_events
+        GROUP BY substr(timestamp, 1, 10)
+        """,
+        """
+        INSERT INTO daily_stats (day, session_time)
+        SELECT substr(start_time, 1, 10), SUM((julianday(end_time) - julianday(start_time)) * 86400)
+        FROM sessions
+        WHERE end_time IS NOT NULL
+        GROUP BY substr(start_time, 1, 10)
+        ON CONFLICT(day) DO UPDATE SET session_time = excluded.session_time
+        """,
+    ],
+    # 3: EAR totals in the rollup, so closed days can serve daily aggregates
+    [
+        "ALTER TABLE daily_stats ADD COLUMN min_ear REAL",
+        "ALTER TABLE daily_stats ADD COLUMN ear_sum REAL NOT NULL DEFAULT 0",
+        """
+        UPDATE daily_stats SET
+            min_ear = (SELECT MIN(ear_value) FROM drowsiness_events
+                       WHERE timestamp >= daily_stats.day AND timestamp < date(daily_stats.day, '+1 day')),
+            ear_sum = COALESCE((SELECT SUM(ear_value) FROM drowsiness_events
+                                WHERE timestamp >= daily_stats.day AND timestamp < date(daily_stats.day, '+1 day')), 0)
+        """,
+    ],
+]
+
+# Aggregation bucket widths in seconds, keyed by the /api/events/aggregate bucket value
+AGGREGATE_BUCKETS = {'5m': 300, '1h': 3600, '1d': 86400}
+# Default window per bucket width when no from= is given
+AGGREGATE_DEFAULT_DAYS = {'5m': 1, '1h': 7, '1d': 30}
+
+def get_connection():
+    """Borrow a pooled connection to the logs database (use as a `with` block)"""
+    return db_pool.connection(DATABASE_FILE)
+
+def migrate(conn):
+    """Apply pending schema migrations, each in its own transaction"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.execute("BEGIN")
+        for statement in statements:
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {number}")
+        conn.commit()
+        print(f"🔧 Applied database migration {number}")
+
+def day_range(day):
+    """Half-open [start, end) timestamp bounds of a 'YYYY-MM-DD' day, usable by the indexes"""
+    next_day = (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    return day, next_day
+
+def roll_up_events(cursor, events):
+    """
+    Add events to the daily_stats rollup (call inside the transaction that inserts them)
+    
+    Args:
+        cursor: Cursor of the open transaction
+        events: List of (timestamp, ear_value, duration_seconds, session_id) tuples
+    """
+    days = {}
+    for timestamp, ear_value, duration_seconds, _ in events:
+        day = timestamp[:10]
+        count, duration, first, last, min_ear, ear_sum = days.get(day, (0, 0.0, timestamp, timestamp, ear_value, 0.0))
+        days[day] = (
+            count + 1, duration + (duration_seconds or 0), min(first, timestamp), max(last, timestamp),
+            min(min_ear, ear_value), ear_sum + ear_value
+        )
+    
+    cursor.executemany("""
+        INSERT INTO daily_stats (day, events, total_duration, first_event, last_event, min_ear, ear_sum)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(day) DO UPDATE SET
+            events = events + excluded.events,
+            total_duration = total_duration + excluded.total_duration,
+            first_event = MIN(COALESCE(first_event, excluded.first_event), excluded.first_event),
+            last_event = MAX(COALESCE(last_event, excluded.last_event), excluded.last_event),
+            min_ear = MIN(COALESCE(min_ear, excluded.min_ear), excluded.min_ear),
+            ear_sum = ear_sum + excluded.ear_sum
+    """, [(day,) + totals for day, totals in days.items()])
+
+def roll_up_session_time(cursor, start_time, duration):
+    """Add a closed session's runtime to the rollup of the day it started (a start time or a day)"""
+    cursor.execute("""
+        INSERT INTO daily_stats (day, session_time) VALUES (?, ?)
+        ON CONFLICT(day) DO UPDATE SET session_time = session_time + excluded.session_time
+    """, (start_time[:10], duration or 0))
+
+def add_change_listener(listener):
+    """Register listener(kind, payload), called after every committed write"""
+    change_listeners.append(listener)
+
+def publish_change(kind, payload):
+    """Invalidate cached reads and tell the change listeners about a committed write"""
+    query_cache.invalidate()
+    for listener in change_listeners:
+        try:
+            listener(kind, payload)
+        except Exception as e:
+            print(f"⚠️ Change listener failed for {kind}: {e}")
+
 def init_db():
     """Initialize database tables if they don't exist"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        # Create tables for drowsiness events
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS drowsiness_events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            ear_value REAL,
-            duration_seconds REAL,
-            session_id TEXT
-        )
-        ''')
-        
-        # Create table for sessions
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sessions (
-            id TEXT PRIMARY KEY,
-            start_time DATETIME DEFAULT CURRENT_TIMESTAMP,
-            end_time DATETIME,
-            total_events INTEGER DEFAULT 0,
-            total_duration_seconds REAL DEFAULT 0
-        )
-        ''')
-        
-        # Create users table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            salt TEXT NOT NULL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # Create tables for drowsiness events
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS drowsiness_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                ear_value REAL,
+                duration_seconds REAL,
+                session_id TEXT
+            )
+            ''')
+
+            # Create table for sessions
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                start_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+                end_time DATETIME,
+                total_events INTEGER DEFAULT 0,
+                total_duration_seconds REAL DEFAULT 0
+            )
+            ''')
+
+            # Create users table
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                salt TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+
+            conn.commit()
+
+            # Bring indexes and derived tables up to date
+            migrate(conn)
         print("✅ Database initialized successfully!")
     except Exception as e:
         print(f"❌ Database initialization error: {e}")
@@ -60,223 +196,466 @@ def create_session():
     try:
         # Format current timestamp in ISO format
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO sessions (id, start_time) VALUES (?, ?)", (session_id, current_time))
-        conn.commit()
-        conn.close()
+
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO sessions (id, start_time) VALUES (?, ?)", (session_id, current_time))
+            conn.commit()
+        publish_change("session_started", {
+            "session": {
+                "id": session_id,
+                "start_time": current_time,
+                "end_time": None,
+                "total_events": 0,
+                "total_duration_seconds": 0,
+                "duration": 0,
+                "event_count": 0
+            }
+        })
         print(f"📝 Started new session: {session_id} at {current_time}")
         return session_id
     except Exception as e:
         print(f"❌ Error creating session: {e}")
         return None
 
+# Session summary columns returned by end_session
+SESSION_SUMMARY_COLUMNS = """
+    id as session_id,
+    start_time,
+    end_time,
+    (julianday(end_time) - julianday(start_time)) * 86400 as duration,
+    total_events as event_count,
+    total_duration_seconds as total_drowsy_time
+"""
+
 def end_session(session_id):
-    """End a session by updating its end time"""
+    """
+    End a session by updating its end time, in a single transaction
+    
+    Returns:
+        dict: Session summary (session_id, start_time, end_time, duration, event_count,
+        total_drowsy_time, already_ended), or None if the session doesn't exist or on error
+    """
     try:
         if not session_id:
             print("⚠️ No session ID provided to end_session")
-            return False
-            
-        # Check if session exists first
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM sessions WHERE id = ?", (session_id,))
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
+            return None
+
+        # The request teardown hook calls this after every request and socket event,
+        # so a missing or already ended session is answered with a read alone,
+        # without taking SQLite's write lock or flushing the event queue
+        with get_connection() as conn:
+            row = conn.execute(f"SELECT {SESSION_SUMMARY_COLUMNS} FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
             print(f"⚠️ Cannot end session, ID not found: {session_id[:8]}")
-            conn.close()
-            return False
-            
-        # Check if session already ended
-        cursor.execute("SELECT end_time FROM sessions WHERE id = ?", (session_id,))
-        result = cursor.fetchone()
+            return None
+        if row['end_time'] is not None:
+            print(f"ℹ️ Session already ended: {session_id[:8]} at {row['end_time']}")
+            return dict(row, already_ended=True)
+
+        # Make sure the session's queued events are counted before it closes
+        flush_events()
         
-        if result and result[0]:
-            print(f"ℹ️ Session already ended: {session_id[:8]} at {result[0]}")
-            conn.close()
-            return True
-            
         # Format current timestamp in ISO format
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        # Update with explicit timestamp
-        cursor.execute("UPDATE sessions SET end_time = ? WHERE id = ?", (current_time, session_id))
-        conn.commit()
-        
-        # Verify update
-        cursor.execute("SELECT end_time FROM sessions WHERE id = ?", (session_id,))
-        end_time = cursor.fetchone()
-        
-        # Get the session duration for logging
-        if end_time and end_time[0]:
-            cursor.execute("""
-                SELECT 
-                    start_time,
-                    (julianday(?) - julianday(start_time)) * 86400 as duration
-                FROM sessions 
-                WHERE id = ?
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Only an open session is updated, so concurrent calls end it exactly once
+            cursor.execute(f"""
+                UPDATE sessions
+                SET end_time = ?
+                WHERE id = ? AND end_time IS NULL
+                RETURNING {SESSION_SUMMARY_COLUMNS}
             """, (current_time, session_id))
+            row = cursor.fetchone()
             
-            session_info = cursor.fetchone()
-            if session_info:
-                start_time, duration = session_info
-                print(f"✅ Ended session: {session_id[:8]} - Started: {start_time}, Ended: {current_time}, Duration: {duration:.2f}s")
-        
-        conn.close()
-        
-        return True
+            if row:
+                summary = dict(row, already_ended=False)
+                roll_up_session_time(cursor, summary['start_time'], summary['duration'])
+            else:
+                # Missing, or already ended - report the stored summary
+                cursor.execute(f"SELECT {SESSION_SUMMARY_COLUMNS} FROM sessions WHERE id = ?", (session_id,))
+                row = cursor.fetchone()
+                summary = dict(row, already_ended=True) if row else None
+
+            conn.commit()
+
+        if summary is None:
+            print(f"⚠️ Cannot end session, ID not found: {session_id[:8]}")
+        elif summary['already_ended']:
+            print(f"ℹ️ Session already ended: {session_id[:8]} at {summary['end_time']}")
+        else:
+            publish_change("session_ended", {
+                "session_id": session_id,
+                "start_time": summary['start_time'],
+                "end_time": current_time,
+                "duration": summary['duration']
+            })
+            print(f"✅ Ended session: {session_id[:8]} - Started: {summary['start_time']}, Ended: {current_time}, Duration: {summary['duration']:.2f}s")
+
+        return summary
     except Exception as e:
         print(f"❌ Error updating session: {e}")
         import traceback
         traceback.print_exc()
-        return False
+        return None
 
-def log_drowsiness_event(ear_value, duration_seconds, session_id):
-    """Log drowsiness event to database"""
+def write_event_batch(events):
+    """
+    Write queued drowsiness events in one transaction
+    
+    Args:
+        events: List of (timestamp, ear_value, duration_seconds, session_id) tuples
+    """
     try:
-        # Print debugging info
-        print(f"🔍 Logging drowsiness event: EAR={ear_value:.2f}, Duration={duration_seconds:.2f}s")
-        
-        # Format current timestamp in ISO format
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Connect to database
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        # Log the event with explicit timestamp
-        cursor.execute(
-            "INSERT INTO drowsiness_events (timestamp, ear_value, duration_seconds, session_id) VALUES (?, ?, ?, ?)",
-            (current_time, ear_value, duration_seconds, session_id)
-        )
-        
-        # Update session stats
-        cursor.execute(
-            "UPDATE sessions SET total_events = total_events + 1, total_duration_seconds = total_duration_seconds + ? WHERE id = ?", 
-            (duration_seconds, session_id)
-        )
-        
-        # Commit and close
-        conn.commit()
-        conn.close()
-        
-        # Verify the event was logged
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM drowsiness_events WHERE session_id = ?", (session_id,))
-        count = cursor.fetchone()[0]
-        conn.close()
+        # Per-session totals, so each session row is updated once per batch
+        session_totals = {}
+        for _, _, duration_seconds, session_id in events:
+            count, duration = session_totals.get(session_id, (0, 0.0))
+            session_totals[session_id] = (count + 1, duration + duration_seconds)
+        
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Log the events with their explicit timestamps
+            cursor.executemany(
+                "INSERT INTO drowsiness_events (timestamp, ear_value, duration_seconds, session_id) VALUES (?, ?, ?, ?)",
+                events
+            )
+            
+            # The batch holds the write lock, so its row IDs are consecutive
+            cursor.execute("SELECT last_insert_rowid()")
+            first_id = cursor.fetchone()[0] - len(events) + 1
+            
+            # Update session stats
+            cursor.executemany(
+                "UPDATE sessions SET total_events = total_events + ?, total_duration_seconds = total_duration_seconds + ? WHERE id = ?",
+                [(count, duration, session_id) for session_id, (count, duration) in session_totals.items()]
+            )
+            
+            # Keep the daily rollup in step
+            roll_up_events(cursor, events)
+            
+            conn.commit()
+        publish_change("events_added", {
+            "events": [
+                {
+                    "id": first_id + i,
+                    "timestamp": timestamp,
+                    "ear_value": ear_value,
+                    "duration_seconds": duration_seconds,
+                    "session_id": session_id
+                }
+                for i, (timestamp, ear_value, duration_seconds, session_id) in enumerate(events)
+            ]
+        })
         
-        print(f"✅ Logged drowsiness event: EAR={ear_value:.2f}, Duration={duration_seconds:.2f}s (Total events: {count})")
+        print(f"✅ Wrote {len(events)} drowsiness events")
         
         # Also log to text file as backup
         with open("drowsiness_log.txt", "a") as f:
-            f.write(f"Drowsiness detected at {current_time} - EAR={ear_value:.2f}, Duration={duration_seconds:.2f}s\n")
-            
+            f.writelines(
+                f"Drowsiness detected at {timestamp} - EAR={ear_value:.2f}, Duration={duration_seconds:.2f}s\n"
+                for timestamp, ear_value, duration_seconds, _ in events
+            )
+    
     except Exception as e:
         print(f"❌ Error logging to database: {e}")
         # Log error to file
         with open("database_error.log", "a") as f:
-            f.write(f"{datetime.now()}: Error logging event - {str(e)}\n")
+            f.write(f"{datetime.now()}: Error logging {len(events)} events - {str(e)}\n")
+
+# Drowsiness events are queued and written in batches off the frame-processing path
+event_writer = EventWriter(write_event_batch)
+
+def flush_events():
+    """Write all queued drowsiness events now"""
+    return event_writer.flush()
 
-def get_events(days=7, start_date=None, end_date=None):
-    """Get drowsiness events based on filters"""
+def log_drowsiness_event(ear_value, duration_seconds, session_id):
+    """Queue a drowsiness event for the background writer"""
+    # Format current timestamp in ISO format
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    event_writer.submit((current_time, float(ear_value), float(duration_seconds), session_id))
+    print(f"🔍 Queued drowsiness event: EAR={ear_value:.2f}, Duration={duration_seconds:.2f}s")
+
+# Columns /api/events may project with fields=
+EVENT_FIELDS = ('id', 'timestamp', 'ear_value', 'duration_seconds', 'session_id')
+# Largest page of events served at once
+EVENTS_MAX_LIMIT = 5000
+
+def event_filters(days=7, start_date=None, end_date=None):
+    """
+    Build the WHERE clause and parameters of an events date window: start_date to
+    end_date when both are given, otherwise the last `days` days
+    """
+    if start_date and end_date:
+        return "timestamp BETWEEN ? AND ?", [start_date, end_date]
+
+    date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+    return "timestamp >= ?", [date_limit]
+
+def encode_cursor(timestamp, event_id):
+    """Encode the (timestamp, id) position of the last event on a page"""
+    return base64.urlsafe_b64encode(f"{timestamp}|{event_id}".encode()).decode()
+
+def decode_cursor(cursor):
+    """Decode a page cursor into (timestamp, id) - raises ValueError if it is malformed"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        query = "SELECT * FROM drowsiness_events WHERE 1=1"
-        params = []
-        
-        if start_date and end_date:
-            query += " AND timestamp BETWEEN ? AND ?"
-            params.extend([start_date, end_date])
-        else:
-            date_limit = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-            query += " AND timestamp >= ?"
-            params.append(date_limit)
+        timestamp, event_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        return timestamp, int(event_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+@query_cache.cached
+def get_events_page(days=7, start_date=None, end_date=None, limit=500, cursor=None, since_id=None, fields=None):
+    """
+    Get one page of drowsiness events, newest first, using keyset pagination
+    
+    Args:
+        days, start_date, end_date: Date window, as for event_filters
+        limit: Maximum number of events on the page (capped at EVENTS_MAX_LIMIT)
+        cursor: next_cursor of the previous page, or None for the first page
+        since_id: Only return events with a larger ID (incremental fetches)
+        fields: Tuple of EVENT_FIELDS to return, or None for all of them
+    
+    Returns:
+        dict: {"events": [...], "next_cursor": cursor string or None on the last page}
+    
+    Raises:
+        ValueError: For an unknown field or a malformed cursor
+    """
+    fields = tuple(fields) if fields else EVENT_FIELDS
+    unknown = [field for field in fields if field not in EVENT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    limit = max(1, min(int(limit), EVENTS_MAX_LIMIT))
+
+    where, params = event_filters(days, start_date, end_date)
+    if cursor:
+        # Row-value comparison walks the timestamp index (rowid breaks timestamp ties)
+        where += " AND (timestamp, id) < (?, ?)"
+        params.extend(decode_cursor(cursor))
+    if since_id is not None:
+        where += " AND id > ?"
+        params.append(int(since_id))
+
+    # The cursor needs id and timestamp even when they are not projected
+    columns = list(dict.fromkeys(('id', 'timestamp') + fields))
+
+    try:
+        with get_connection() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(columns)} FROM drowsiness_events WHERE {where} "
+                "ORDER BY timestamp DESC, id DESC LIMIT ?",
+                params + [limit + 1]  # One extra row tells whether there is a next page
+            ).fetchall()
+    except Exception as e:
+        print(f"❌ Error fetching events page: {e}")
+        return {"events": [], "next_cursor": None}
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['timestamp'], rows[-1]['id'])
+
+    return {
+        "events": [{field: row[field] for field in fields} for row in rows],
+        "next_cursor": next_cursor
+    }
+
+def parse_time_bound(value, end=False):
+    """
+    Parse a from/to bound ('YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS') into a datetime
+
+    A date-only upper bound covers that whole day. Raises ValueError if malformed
+    """
+    value = value.strip().replace('T', ' ')
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if end and fmt == '%Y-%m-%d':
+            parsed += timedelta(days=1)
+        return parsed
+    raise ValueError(f"Invalid time bound '{value}' (expected YYYY-MM-DD or YYYY-MM-DD HH:MM:SS)")
+
+def _aggregate_bucket(row):
+    count = row['count']
+    return {
+        "start": row['bucket_start'],
+        "count": count,
+        "total_duration": row['total_duration'] or 0,
+        "mean_duration": (row['total_duration'] or 0) / count if count else 0,
+        "min_ear": row['min_ear'],
+        "mean_ear": row['ear_sum'] / count if count and row['ear_sum'] is not None else None
+    }
+
+@query_cache.cached
+def aggregate_events(bucket='1h', start=None, end=None, session_id=None):
+    """
+    Aggregate drowsiness events into fixed-width time buckets
+    
+    Args:
+        bucket: Bucket width, one of AGGREGATE_BUCKETS ("5m", "1h", "1d")
+        start: Inclusive lower bound string, defaults to AGGREGATE_DEFAULT_DAYS back
+        end: Exclusive upper bound string (a bare date includes that day), defaults to now
+        session_id: Only aggregate this session's events
+    
+    Returns:
+        dict: {"bucket", "from", "to", "buckets": [{"start", "count", "total_duration",
+        "mean_duration", "min_ear", "mean_ear"}, ...]} with only non-empty buckets, oldest first
+    
+    Raises:
+        ValueError: For an unknown bucket width or a malformed bound
+    """
+    if bucket not in AGGREGATE_BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}' (expected one of {', '.join(AGGREGATE_BUCKETS)})")
+    width = AGGREGATE_BUCKETS[bucket]
+
+    end_time = parse_time_bound(end, end=True) if end else datetime.now() + timedelta(seconds=1)
+    start_time = parse_time_bound(start) if start else (
+        datetime.combine(end_time.date(), datetime.min.time()) - timedelta(days=AGGREGATE_DEFAULT_DAYS[bucket] - 1)
+    )
+    start_str = start_time.strftime("%Y-%m-%d %H:%M:%S")
+    end_str = end_time.strftime("%Y-%m-%d %H:%M:%S")
+
+    # Event ranges to aggregate from the raw table, and closed days to take from the rollup
+    ranges = [(start_str, end_str)]
+    rollup_days = None
+    if bucket == '1d' and session_id is None:
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        first_day = datetime.combine(start_time.date(), datetime.min.time())
+        if first_day < start_time:
+            first_day += timedelta(days=1)
+        last_day = min(datetime.combine(end_time.date(), datetime.min.time()), today)
+        if first_day < last_day:
+            first_day_str = first_day.strftime("%Y-%m-%d %H:%M:%S")
+            last_day_str = last_day.strftime("%Y-%m-%d %H:%M:%S")
+            rollup_days = (first_day.strftime('%Y-%m-%d'), last_day.strftime('%Y-%m-%d'))
+            ranges = [r for r in ((start_str, first_day_str), (last_day_str, end_str)) if r[0] < r[1]]
+
+    try:
+        with get_connection() as conn:
+            buckets = []
             
-        query += " ORDER BY timestamp DESC"
-        
-        cursor.execute(query, params)
-        events = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        return events
+            if rollup_days:
+                rows = conn.execute("""
+                    SELECT
+                        day || ' 00:00:00' as bucket_start,
+                        events as count,
+                        total_duration,
+                        min_ear,
+                        ear_sum
+                    FROM daily_stats
+                    WHERE day >= ? AND day < ? AND events > 0
+                """, rollup_days).fetchall()
+                buckets.extend(_aggregate_bucket(row) for row in rows)
+
+            for range_start, range_end in ranges:
+                # Timestamp range on the index, bucketed by epoch seconds
+                query = """
+                    SELECT
+                        datetime(CAST(strftime('%s', timestamp) AS INTEGER) / ? * ?, 'unixepoch') as bucket_start,
+                        COUNT(*) as count,
+                        SUM(duration_seconds) as total_duration,
+                        MIN(ear_value) as min_ear,
+                        SUM(ear_value) as ear_sum
+                    FROM drowsiness_events
+                    WHERE timestamp >= ? AND timestamp < ?
+                """
+                params = [width, width, range_start, range_end]
+                if session_id:
+                    query += " AND session_id = ?"
+                    params.append(session_id)
+                query += " GROUP BY bucket_start"
+
+                rows = conn.execute(query, params).fetchall()
+                buckets.extend(_aggregate_bucket(row) for row in rows)
+
+        buckets.sort(key=lambda b: b['start'])
+        return {
+            "bucket": bucket,
+            "from": start_str,
+            "to": end_str,
+            "buckets": buckets
+        }
     except Exception as e:
-        print(f"❌ Error fetching events: {e}")
-        return []
+        print(f"❌ Error aggregating events: {e}")
+        return None
 
 def get_session_info(session_id):
     """Get detailed information about a single session"""
     try:
         if not session_id:
             return None
-            
-        conn = sqlite3.connect(DATABASE_FILE)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Get session data with duration calculation
-        cursor.execute("""
-            SELECT 
-                s.id,
-                datetime(s.start_time) as start_time,
-                datetime(s.end_time) as end_time,
-                s.total_events,
-                s.total_duration_seconds,
-                CASE
-                    WHEN s.end_time IS NULL THEN 0
-                    ELSE (julianday(s.end_time) - julianday(s.start_time)) * 86400
-                END as duration,
-                (SELECT COUNT(*) FROM drowsiness_events WHERE session_id = s.id) as event_count
-            FROM sessions s
-            WHERE s.id = ?
-        """, (session_id,))
-        
-        row = cursor.fetchone()
-        session = dict(row) if row else None
-        
-        conn.close()
-        
+
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # Get session data with duration calculation
+            cursor.execute("""
+                SELECT
+                    s.id,
+                    datetime(s.start_time) as start_time,
+                    datetime(s.end_time) as end_time,
+                    s.total_events,
+                    s.total_duration_seconds,
+                    CASE
+                        WHEN s.end_time IS NULL THEN 0
+                        ELSE (julianday(s.end_time) - julianday(s.start_time)) * 86400
+                    END as duration,
+                    (SELECT COUNT(*) FROM drowsiness_events WHERE session_id = s.id) as event_count
+                FROM sessions s
+                WHERE s.id = ?
+            """, (session_id,))
+
+            row = cursor.fetchone()
+            session = dict(row) if row else None
+
         if session:
             print(f"📊 Session {session_id[:8]}: Duration = {session.get('duration', 0):.2f}s, Events = {session.get('event_count', 0)}")
-        
+
         return session
     except Exception as e:
         print(f"❌ Error fetching session info: {e}")
         return None
 
+@query_cache.cached
 def get_sessions():
     """Get all sessions with event counts and accurate durations"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Ensure we get proper ISO format dates and accurate duration calculation
-        cursor.execute("""
-            SELECT 
-                s.id,
-                datetime(s.start_time) as start_time,
-                datetime(s.end_time) as end_time,
-                s.total_events,
-                s.total_duration_seconds,
-                CASE
-                    WHEN s.end_time IS NULL THEN 0
-                    ELSE (julianday(s.end_time) - julianday(s.start_time)) * 86400
-                END as duration,
-                (SELECT COUNT(*) FROM drowsiness_events WHERE session_id = s.id) as event_count
-            FROM sessions s 
-            ORDER BY s.start_time DESC
-        """)
-        
-        sessions = [dict(row) for row in cursor.fetchall()]
-        
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # Ensure we get proper ISO format dates and accurate duration calculation
+            cursor.execute("""
+                SELECT
+                    s.id,
+                    datetime(s.start_time) as start_time,
+                    datetime(s.end_time) as end_time,
+                    s.total_events,
+                    s.total_duration_seconds,
+                    CASE
+                        WHEN s.end_time IS NULL THEN 0
+                        ELSE (julianday(s.end_time) - julianday(s.start_time)) * 86400
+                    END as duration,
+                    COALESCE(e.event_count, 0) as event_count
+                FROM sessions s
+                LEFT JOIN (
+                    SELECT session_id, COUNT(*) as event_count
+                    FROM drowsiness_events
+                    GROUP BY session_id
+                ) e ON e.session_id = s.id
+                ORDER BY s.start_time DESC
+            """)
+
+            sessions = [dict(row) for row in cursor.fetchall()]
+
         # Debug session data
         print(f"📊 Retrieved {len(sessions)} sessions")
         total_duration = 0
@@ -286,73 +665,68 @@ def get_sessions():
             duration = session.get('duration', 0)
             total_duration += duration
             print(f"  Session {session['id'][:8]}: {start} to {end} - Duration: {duration:.2f}s")
-        
+
         print(f"  Total duration of all sessions: {total_duration:.2f}s")
-        
-        conn.close()
-        
+
         return sessions
     except Exception as e:
         print(f"❌ Error fetching sessions: {e}")
         return []
 
+@query_cache.cached
 def get_stats():
     """Get overall and today's stats"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        # Get overall stats
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total_events,
-                SUM(duration_seconds) as total_duration,
-                AVG(duration_seconds) as avg_duration,
-                MIN(timestamp) as first_event,
-                MAX(timestamp) as last_event
-            FROM drowsiness_events
-        """)
-        
-        overall = cursor.fetchone()
-        
-        # Get today's stats - use date() function for proper comparison
-        today = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as today_events,
-                SUM(duration_seconds) as today_duration
-            FROM drowsiness_events
-            WHERE date(timestamp) = ?
-        """, (today,))
-        
-        today_stats = cursor.fetchone()
-        
-        # Get today's session durations - more accurate camera runtime
-        cursor.execute("""
-            SELECT 
-                SUM(CASE
-                    WHEN end_time IS NULL THEN 
-                        (julianday('now') - julianday(start_time)) * 86400
-                    ELSE 
-                        (julianday(end_time) - julianday(start_time)) * 86400
-                END) as total_session_time
-            FROM sessions
-            WHERE date(start_time) = ?
-        """, (today,))
-        
-        session_stats = cursor.fetchone()
-        total_session_time = session_stats[0] if session_stats and session_stats[0] is not None else 0
-        
-        conn.close()
-        
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # Get overall stats from the daily rollup - one row per day, not per event
+            cursor.execute("""
+                SELECT
+                    COALESCE(SUM(events), 0) as total_events,
+                    SUM(total_duration) as total_duration,
+                    SUM(total_duration) / NULLIF(SUM(events), 0) as avg_duration,
+                    MIN(first_event) as first_event,
+                    MAX(last_event) as last_event
+                FROM daily_stats
+            """)
+
+            overall = cursor.fetchone()
+
+            # Get today's stats - a single rollup row
+            today = datetime.now().strftime('%Y-%m-%d')
+            day_start, day_end = day_range(today)
+            cursor.execute("""
+                SELECT
+                    COALESCE(SUM(events), 0) as today_events,
+                    SUM(total_duration) as today_duration,
+                    COALESCE(SUM(session_time), 0) as closed_session_time
+                FROM daily_stats
+                WHERE day = ?
+            """, (today,))
+
+            today_stats = cursor.fetchone()
+
+            # Add the live runtime of today's still-open sessions (partial index)
+            cursor.execute("""
+                SELECT
+                    SUM((julianday('now') - julianday(start_time)) * 86400) as open_session_time
+                FROM sessions
+                WHERE end_time IS NULL AND start_time >= ? AND start_time < ?
+            """, (day_start, day_end))
+
+            session_stats = cursor.fetchone()
+            open_session_time = session_stats[0] if session_stats and session_stats[0] is not None else 0
+            total_session_time = today_stats[2] + open_session_time
+
         # Clean None values
         total_duration = overall[1] if overall[1] is not None else 0
         avg_duration = overall[2] if overall[2] is not None else 0
         today_duration = today_stats[1] if today_stats[1] is not None else 0
-        
+
         # Debug print for today's stats
         print(f"📊 Today's stats: Events={today_stats[0]}, Duration={today_duration}, Session Time={total_session_time:.2f}s")
-        
+
         stats = {
             "overall": {
                 "total_events": overall[0],
@@ -367,7 +741,7 @@ def get_stats():
                 "session_time": total_session_time
             }
         }
-        
+
         return stats
     except Exception as e:
         print(f"❌ Error getting stats: {e}")
@@ -378,29 +752,39 @@ def add_event(ear_value, duration, session_id):
     try:
         # Format current timestamp in ISO format
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        # Insert event with current session ID and timestamp
-        cursor.execute(
-            "INSERT INTO drowsiness_events (timestamp, ear_value, duration_seconds, session_id) VALUES (?, ?, ?, ?)",
-            (current_time, ear_value, duration, session_id)
-        )
-        
-        # Update session stats
-        cursor.execute(
-            "UPDATE sessions SET total_events = total_events + 1, total_duration_seconds = total_duration_seconds + ? WHERE id = ?",
-            (duration, session_id)
-        )
-        
-        conn.commit()
-        
-        # Get the newly created event
-        event_id = cursor.lastrowid
-        
-        conn.close()
-        
+
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # Insert event with current session ID and timestamp
+            cursor.execute(
+                "INSERT INTO drowsiness_events (timestamp, ear_value, duration_seconds, session_id) VALUES (?, ?, ?, ?)",
+                (current_time, ear_value, duration, session_id)
+            )
+
+            # Get the newly created event
+            event_id = cursor.lastrowid
+
+            # Update session stats
+            cursor.execute(
+                "UPDATE sessions SET total_events = total_events + 1, total_duration_seconds = total_duration_seconds + ? WHERE id = ?",
+                (duration, session_id)
+            )
+
+            # Keep the daily rollup in step
+            roll_up_events(cursor, [(current_time, ear_value, duration, session_id)])
+
+            conn.commit()
+        publish_change("events_added", {
+            "events": [{
+                "id": event_id,
+                "timestamp": current_time,
+                "ear_value": ear_value,
+                "duration_seconds": duration,
+                "session_id": session_id
+            }]
+        })
+
         return event_id
     except Exception as e:
         print(f"❌ Error adding event: {e}")
@@ -409,33 +793,31 @@ def add_event(ear_value, duration, session_id):
 def get_db_status():
     """Get database status information"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        # Check if tables exist
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='drowsiness_events'")
-        event_table_exists = cursor.fetchone() is not None
-        
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='sessions'")
-        session_table_exists = cursor.fetchone() is not None
-        
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'")
-        users_table_exists = cursor.fetchone() is not None
-        
-        # Count records
-        cursor.execute("SELECT COUNT(*) FROM drowsiness_events")
-        event_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM sessions")
-        session_count = cursor.fetchone()[0]
-        
-        users_count = 0
-        if users_table_exists:
-            cursor.execute("SELECT COUNT(*) FROM users")
-            users_count = cursor.fetchone()[0]
-        
-        conn.close()
-        
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # Check if tables exist
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='drowsiness_events'")
+            event_table_exists = cursor.fetchone() is not None
+
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='sessions'")
+            session_table_exists = cursor.fetchone() is not None
+
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'")
+            users_table_exists = cursor.fetchone() is not None
+
+            # Count records
+            cursor.execute("SELECT COUNT(*) FROM drowsiness_events")
+            event_count = cursor.fetchone()[0]
+
+            cursor.execute("SELECT COUNT(*) FROM sessions")
+            session_count = cursor.fetchone()[0]
+
+            users_count = 0
+            if users_table_exists:
+                cursor.execute("SELECT COUNT(*) FROM users")
+                users_count = cursor.fetchone()[0]
+
         return {
             "status": "connected",
             "database_file": DATABASE_FILE,
@@ -452,7 +834,8 @@ def get_db_status():
                     "exists": users_table_exists,
                     "count": users_count
                 }
-            }
+            },
+            "query_cache": query_cache.stats()
         }
     except Exception as e:
         return {
@@ -463,64 +846,110 @@ def get_db_status():
 def get_open_sessions():
     """Get all session IDs for sessions that don't have an end_time set"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        # Find sessions without end_time
-        cursor.execute("""
-            SELECT id FROM sessions 
-            WHERE end_time IS NULL OR end_time = ''
-        """)
-        
-        sessions = [row[0] for row in cursor.fetchall()]
-        
-        conn.close()
-        
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # Find sessions without end_time
+            cursor.execute("""
+                SELECT id FROM sessions
+                WHERE end_time IS NULL
+            """)
+
+            sessions = [row[0] for row in cursor.fetchall()]
+
         # Debug info
         if sessions:
             print(f"📊 Found {len(sessions)} open sessions that need to be closed")
             for session_id in sessions[:5]:  # Show first 5
                 print(f"  Open session: {session_id[:8]}")
-        
+
         return sessions
     except Exception as e:
         print(f"❌ Error fetching open sessions: {e}")
         return []
 
+def close_stale_sessions(max_age_seconds):
+    """
+    Close every open session started more than max_age_seconds ago
+    
+    One UPDATE over the partial open-session index, however many sessions are open
+    
+    Returns:
+        list: IDs of the sessions that were closed
+    """
+    try:
+        # Queued events of the closing sessions must be counted first
+        flush_events()
+        
+        now = datetime.now()
+        current_time = now.strftime("%Y-%m-%d %H:%M:%S")
+        cutoff = (now - timedelta(seconds=max_age_seconds)).strftime("%Y-%m-%d %H:%M:%S")
+        
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE sessions
+                SET end_time = ?
+                WHERE end_time IS NULL AND start_time < ?
+                RETURNING id, start_time, (julianday(?) - julianday(start_time)) * 86400 as duration
+            """, (current_time, cutoff, current_time))
+            closed = cursor.fetchall()
+            
+            # One rollup update per start day
+            day_totals = {}
+            for _, start_time, duration in closed:
+                day_totals[start_time[:10]] = day_totals.get(start_time[:10], 0) + (duration or 0)
+            for day, duration in day_totals.items():
+                roll_up_session_time(cursor, day, duration)
+            
+            conn.commit()
+        
+        for session_id, start_time, duration in closed:
+            print(f"Closing stale session {session_id[:8]} (age: {duration/60:.1f} minutes)")
+            publish_change("session_ended", {
+                "session_id": session_id,
+                "start_time": start_time,
+                "end_time": current_time,
+                "duration": duration
+            })
+        
+        return [row[0] for row in closed]
+    except Exception as e:
+        print(f"❌ Error closing stale sessions: {e}")
+        return []
+
 def get_session_age(session_id):
     """Get the age of a session in seconds"""
     try:
         if not session_id:
             print("⚠️ No session ID provided")
             return 0
-            
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        # First check if the session exists
-        cursor.execute("SELECT COUNT(*) FROM sessions WHERE id = ?", (session_id,))
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
-            print(f"⚠️ Session not found in database: {session_id[:8]}")
-            conn.close()
-            return 0
-        
-        # Get the start time of the session
-        cursor.execute("SELECT start_time, end_time FROM sessions WHERE id = ?", (session_id,))
-        result = cursor.fetchone()
-        conn.close()
-        
+
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # First check if the session exists
+            cursor.execute("SELECT COUNT(*) FROM sessions WHERE id = ?", (session_id,))
+            count = cursor.fetchone()[0]
+
+            if count == 0:
+                print(f"⚠️ Session not found in database: {session_id[:8]}")
+                return 0
+
+            # Get the start time of the session
+            cursor.execute("SELECT start_time, end_time FROM sessions WHERE id = ?", (session_id,))
+            result = cursor.fetchone()
+
         if not result:
             print(f"⚠️ Session not found: {session_id[:8]}")
             return 0
-            
+
         start_time_str, end_time_str = result
-        
+
         if not start_time_str:
             print(f"⚠️ Session has no start time: {session_id[:8]}")
             return 0
-            
+
         # Parse the timestamps
         try:
             start_time = datetime.strptime(start_time_str, "%Y-%m-%d %H:%M:%S")
@@ -533,18 +962,18 @@ def get_session_age(session_id):
             except ValueError:
                 print(f"⚠️ Unable to parse start time: {start_time_str}")
                 return 0
-        
+
         # If end_time is None, calculate age based on current time
         if not end_time_str:
             # For active sessions, use current time
             current_time = datetime.now()
             age_seconds = (current_time - start_time).total_seconds()
-            
+
             if age_seconds < 0:
                 print(f"⚠️ Negative session age: {age_seconds}s - Session might have clock issues")
                 # Use a safe minimum value
                 age_seconds = 0
-            
+
             print(f"📊 Active session {session_id[:8]}: Start={start_time}, Now={current_time}, Duration={age_seconds:.2f}s (still running)")
         else:
             # For completed sessions, use end_time
@@ -561,18 +990,18 @@ def get_session_age(session_id):
                     # Fallback to current time
                     end_time = datetime.now()
                     print(f"📊 Using current time as end time: {end_time}")
-            
+
             age_seconds = (end_time - start_time).total_seconds()
-            
+
             if age_seconds < 0:
                 print(f"⚠️ Negative session age: {age_seconds}s - Clock issues detected")
                 # Use a safe minimum value
                 age_seconds = 0
-                
+
             print(f"📊 Completed session {session_id[:8]}: Start={start_time}, End={end_time}, Duration={age_seconds:.2f}s")
-        
+
         return age_seconds
-            
+
     except Exception as e:
         print(f"❌ Error calculating session age: {e}")
         import traceback
@@ -584,45 +1013,50 @@ def reset_daily_logs():
     try:
         # Get today's date for filtering
         today = datetime.now().strftime('%Y-%m-%d')
-        
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        # End any active sessions
-        cursor.execute("""
-            UPDATE sessions 
-            SET end_time = datetime('now')
-            WHERE end_time IS NULL OR end_time = ''
-        """)
-        
-        # Delete today's drowsiness events
-        cursor.execute("""
-            DELETE FROM drowsiness_events
-            WHERE date(timestamp) = ?
-        """, (today,))
-        
-        # Delete today's sessions
-        cursor.execute("""
-            DELETE FROM sessions
-            WHERE date(start_time) = ?
-        """, (today,))
-        
-        conn.commit()
-        conn.close()
-        
+        day_start, day_end = day_range(today)
+
+        # Queued events must not land after today's rows are deleted
+        flush_events()
+
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # End any active sessions, rolling up the runtime of those started before today
+            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cursor.execute("""
+                SELECT start_time, (julianday(?) - julianday(start_time)) * 86400 as duration
+                FROM sessions
+                WHERE end_time IS NULL AND start_time < ?
+            """, (current_time, day_start))
+            for start_time, duration in cursor.fetchall():
+                roll_up_session_time(cursor, start_time, duration)
+
+            cursor.execute("""
+                UPDATE sessions
+                SET end_time = ?
+                WHERE end_time IS NULL
+            """, (current_time,))
+
+            # Delete today's drowsiness events
+            cursor.execute("""
+                DELETE FROM drowsiness_events
+                WHERE timestamp >= ? AND timestamp < ?
+            """, (day_start, day_end))
+
+            # Delete today's sessions
+            cursor.execute("""
+                DELETE FROM sessions
+                WHERE start_time >= ? AND start_time < ?
+            """, (day_start, day_end))
+
+            # And today's rollup
+            cursor.execute("DELETE FROM daily_stats WHERE day = ?", (today,))
+
+            conn.commit()
+        publish_change("reset", {"day": today})
+
         print(f"✅ Reset logs data for {today}")
         return True
     except Exception as e:
         print(f"❌ Error resetting logs: {e}")
         return False
-
-# Instead of directly loading the model
-# model = tf.keras.models.load_model("drowsiness_model2.h5")
-
-# Use a try-except block or conditional check
-try:
-    model = tf.keras.models.load_model("drowsiness_model2.h5")
-except:
-    print("Model not found in app.py, using placeholder")
-    # Create a simple placeholder model
-    model = tf.keras.Sequential() 
\ No newline at end of file
@@ -0,0 +1,89 @@
+import os
+import queue
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Connections kept open per database file, reused across requests and green threads
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+# Page cache per connection, in KiB
+CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 8192))
+# Prepared statements kept per connection
+STATEMENT_CACHE_SIZE = 128
+
+_pools = {}
+_all_connections = set()
+_lock = threading.Lock()
+
+def _open(database_file):
+    """Open and tune a new connection"""
+    conn = sqlite3.connect(
+        database_file,
+        timeout=10,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,  # Pooled connections move between green threads
+    )
+    conn.row_factory = sqlite3.Row
+
+    # WAL lets readers run alongside the writer; NORMAL sync is safe with WAL
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+    with _lock:
+        _all_connections.add(conn)
+    return conn
+
+def _discard(conn):
+    with _lock:
+        _all_connections.discard(conn)
+    conn.close()
+
+@contextmanager
+def connection(database_file):
+    """
+    Borrow a pooled connection for the duration of a `with` block
+
+    Rows are sqlite3.Row objects (index and key access). Any transaction still open
+    when the block exits - including on error - is rolled back before the
+    connection goes back to the pool
+    """
+    with _lock:
+        pool = _pools.get(database_file)
+        if pool is None:
+            pool = _pools[database_file] = queue.LifoQueue(maxsize=POOL_SIZE)
+
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _open(database_file)
+
+    try:
+        yield conn
+    finally:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            pool.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            _discard(conn)
+
+def close_all():
+    """Close every pooled connection (called on shutdown)"""
+    with _lock:
+        connections = list(_all_connections)
+        _all_connections.clear()
+        _pools.clear()
+
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    if connections:
+        print(f"🔒 Closed {len(connections)} database connections")
+
+atexit.register(close_all)
@@ -2,48 +2,111 @@ import cv2
 import dlib
 import numpy as np
 from scipy.spatial import distance
-import pygame
 import time
 import base64
-from PIL import Image
-import io
-import tensorflow as tf
 import os
+import threading
+import inference
 
-# Initialize Tensorflow model for eye state detection
-try:
-    # Print current directory for debugging
-    print(f"Current directory: {os.getcwd()}")
-    print(f"Looking for model file: {os.path.exists('eye_state_model.h5')}")
-    
-    # Load model with explicit path to ensure it's found
-    model_path = os.path.join(os.getcwd(), "eye_state_model.h5")
-    print(f"Loading model from: {model_path}")
+# Heavy models are loaded by load_models(), in the background, so importing this
+# module (and starting the API server) stays fast. Until then frames get "not ready"
+use_eye_model = False  # Eye state model loaded and enabled
+pygame = None          # Imported once the sound alert is initialised
+predictor = None       # Dlib's 68-landmark predictor (safe to share between threads)
+_detectors = threading.local()  # Dlib's face detector, one per thread (see get_detector)
+
+# Readiness of the detection stack, reported by /api/ready
+load_status = {
+    "ready": False,
+    "loading": False,
+    "eye_model": False,
+    "backend": None,
+    "sound": False,
+    "load_seconds": None,
+    "error": None
+}
+_load_lock = threading.Lock()
+
+def load_models(model_path=None):
+    """
+    Load the eye state model, the Dlib detector and predictor and the alert sound
     
-    # Load with error verbosity
-    eye_model = tf.keras.models.load_model(model_path, compile=False)
+    Safe to call more than once - only the first call loads anything. Meant to run
+    off the event loop (a background OS thread) right after the server starts
     
-    # Print model summary to verify it loaded correctly
-    eye_model.summary()
+    Returns:
+        bool: True once face detection is ready
+    """
+    global use_eye_model, pygame, predictor
     
-    print("🧠 Eye state model loaded successfully!")
-    use_eye_model = True
-except Exception as e:
-    print(f"⚠️ Error loading eye state model: {e}")
-    print("⚠️ Falling back to traditional EAR method")
-    use_eye_model = False
-
-# Initialize Pygame sound alert
-pygame.mixer.init()
-try:
-    pygame.mixer.music.load("alert.mp3")  # Ensure "alert.mp3" is in the working directory
-    print("🔊 Sound Loaded Successfully!")
-except pygame.error as e:
-    print(f"⚠️ Error loading sound: {e}")
-
-# Load Dlib's face detector and landmark predictor
-detector = dlib.get_frontal_face_detector()
-predictor = dlib.shape_predictor("shape_predictor_68_face_landmarks.dat")
+    with _load_lock:
+        if load_status["ready"]:
+            return True
+        load_status["loading"] = True
+        start = time.perf_counter()
+        
+        try:
+            # Load the model once into the compiled inference engine
+            model_path = model_path or os.path.join(os.getcwd(), "eye_state_model.h5")
+            print(f"Looking for model file: {os.path.exists(model_path)}")
+            use_eye_model = inference.load_engine(model_path)
+            if not use_eye_model:
+                print("⚠️ Falling back to traditional EAR method")
+            load_status["eye_model"] = use_eye_model
+            load_status["backend"] = inference.backend_name
+            
+            # Initialize Pygame sound alert
+            try:
+                import pygame as pygame_module
+                pygame_module.mixer.init()
+                pygame_module.mixer.music.load("alert.mp3")  # Ensure "alert.mp3" is in the working directory
+                pygame = pygame_module
+                load_status["sound"] = True
+                print("🔊 Sound Loaded Successfully!")
+            except Exception as e:
+                print(f"⚠️ Error loading sound: {e}")
+            
+            # Load Dlib's face detector and landmark predictor
+            get_detector()
+            predictor = dlib.shape_predictor("shape_predictor_68_face_landmarks.dat")
+            
+            load_status["ready"] = True
+            print(f"✅ Detection ready in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            load_status["error"] = str(e)
+            print(f"❌ Error loading detection models: {e}")
+        finally:
+            load_status["loading"] = False
+            load_status["load_seconds"] = round(time.perf_counter() - start, 2)
+        
+        return load_status["ready"]
+
+def get_detector():
+    """
+    Get the calling thread's Dlib face detector
+
+    A dlib object detector must not be used by two threads at once, and frames are
+    processed on several pool threads, so each thread builds its own
+    """
+    detector = getattr(_detectors, 'detector', None)
+    if detector is None:
+        detector = _detectors.detector = dlib.get_frontal_face_detector()
+    return detector
+
+def is_ready():
+    """Check whether frames can be processed yet"""
+    return load_status["ready"]
+
+def play_alert_sound():
+    """Start the looping alert sound, if the sound loaded"""
+    if pygame is not None:
+        pygame.mixer.music.stop()  # Stop previous sound before playing again
+        pygame.mixer.music.play(-1)  # -1 means loop indefinitely
+
+def stop_alert_sound():
+    """Stop the alert sound, if the sound loaded"""
+    if pygame is not None:
+        pygame.mixer.music.stop()
 
 # Eye landmarks
 LEFT_EYE = list(range(42, 48))
@@ -54,11 +117,142 @@ EAR_THRESHOLD = 0.25  # If EAR < 0.25, eyes are considered closed
 CLOSED_FRAMES = 3    # Number of consecutive frames before triggering alert
 EYE_IMG_SIZE = (24, 24)  # Size for eye model input
 
-# Global variables
-frame_count = 0       # Counter for closed-eye frames
-alert_active = False  # Track if alert is playing
-alert_start_time = 0  # Track when alert started
-drowsiness_start_time = 0  # Track when drowsiness started for duration calculation
+# Face tracking - run the full HOG detector only every N frames, follow the face
+# with a correlation tracker in between
+FACE_TRACKING = os.environ.get('FACE_TRACKING', '1') == '1'
+DETECT_EVERY_N_FRAMES = int(os.environ.get('DETECT_EVERY_N_FRAMES', 5))
+TRACKING_MIN_CONFIDENCE = float(os.environ.get('TRACKING_MIN_CONFIDENCE', 7.0))  # Peak-to-sidelobe ratio
+
+# Detection scale - faces are detected on a gray image downscaled to this width (0 = native
+# resolution), then mapped back so landmarks are still fitted at full resolution
+DETECTION_WIDTH = int(os.environ.get('DETECTION_WIDTH', 320))
+DETECTION_UPSAMPLE = int(os.environ.get('DETECTION_UPSAMPLE', 0))  # HOG pyramid upsampling steps
+DETECTION_VALIDATE = os.environ.get('DETECTION_VALIDATE', '0') == '1'  # Log IoU against full-res detection
+
+class FrameBuffers:
+    """Preallocated per-stream image buffers, reused until the frame size changes"""
+    __slots__ = ('gray', 'small', 'eye_crop', 'eye_batch')
+
+    def __init__(self):
+        self.gray = None    # Full-resolution grayscale frame
+        self.small = None   # Downscaled grayscale frame for face detection
+        self.eye_crop = np.empty((EYE_IMG_SIZE[1], EYE_IMG_SIZE[0], 3), dtype=np.uint8)  # Resized BGR eye ROI
+        self.eye_batch = np.empty((2, EYE_IMG_SIZE[1], EYE_IMG_SIZE[0], 3), dtype=np.float32)  # Model input
+
+    def gray_like(self, frame):
+        """Grayscale buffer matching the frame size"""
+        if self.gray is None or self.gray.shape != frame.shape[:2]:
+            self.gray = np.empty(frame.shape[:2], dtype=np.uint8)
+        return self.gray
+
+    def small_for(self, width, height):
+        """Detection buffer of the given size"""
+        if self.small is None or self.small.shape != (height, width):
+            self.small = np.empty((height, width), dtype=np.uint8)
+        return self.small
+
+    def eye_batch_for(self, count):
+        """Model input batch with room for at least `count` eye crops"""
+        if len(self.eye_batch) < count:
+            self.eye_batch = np.empty((count,) + self.eye_batch.shape[1:], dtype=np.float32)
+        return self.eye_batch
+
+class DetectorState:
+    """Drowsiness tracking state for a single camera stream (one per connection)"""
+    __slots__ = ('session_id', 'frame_count', 'alert_active', 'alert_start_time', 'drowsiness_start_time',
+                 'tracker', 'frames_since_detection', 'buffers')
+
+    def __init__(self, session_id=None):
+        self.session_id = session_id
+        self.frame_count = 0             # Counter for closed-eye frames
+        self.alert_active = False        # Track if alert is playing
+        self.alert_start_time = 0        # Track when alert started
+        self.drowsiness_start_time = 0   # Track when drowsiness started for duration calculation
+        self.tracker = None              # dlib.correlation_tracker following the face, if any
+        self.frames_since_detection = 0  # Frames served by the tracker since the last full detection
+        self.buffers = FrameBuffers()    # Reusable decode/detection/model buffers
+
+def get_stream_state(states, key, session_id):
+    """Get the detector state for a stream from `states`, starting fresh when its session changes"""
+    state = states.get(key)
+    if state is None or state.session_id != session_id:
+        stop_alert(state)
+        state = states[key] = DetectorState(session_id)
+    return state
+
+def rect_iou(a, b):
+    """Intersection over union of two dlib rectangles"""
+    inter = a.intersect(b)
+    inter_area = inter.area() if inter.right() >= inter.left() and inter.bottom() >= inter.top() else 0
+    union_area = a.area() + b.area() - inter_area
+    return inter_area / union_area if union_area else 0.0
+
+def validate_detection_scale(gray, faces):
+    """
+    Compare downscaled detections with the native-resolution detector
+    
+    Returns:
+        list: Best IoU against the full-resolution result for each full-resolution face
+    """
+    reference = get_detector()(gray, DETECTION_UPSAMPLE)
+    ious = [max((rect_iou(ref, face) for face in faces), default=0.0) for ref in reference]
+    print(f"📐 Detection scale check: {len(faces)} scaled vs {len(reference)} full-res faces, IoU={[round(i, 2) for i in ious]}")
+    return ious
+
+def detect_faces(gray, buffers=None):
+    """
+    Run the HOG face detector on a downscaled copy of the frame
+    
+    Args:
+        gray: Full-resolution grayscale frame
+        buffers: Optional FrameBuffers to downscale into
+        
+    Returns:
+        list: dlib rectangles in the coordinates of the full-resolution frame
+    """
+    height, width = gray.shape[:2]
+    if not DETECTION_WIDTH or width <= DETECTION_WIDTH:
+        return list(get_detector()(gray, DETECTION_UPSAMPLE))
+    
+    scale = DETECTION_WIDTH / width
+    size = (DETECTION_WIDTH, max(1, round(height * scale)))
+    small = buffers.small_for(*size) if buffers is not None else None
+    small = cv2.resize(gray, size, dst=small, interpolation=cv2.INTER_AREA)
+    faces = [
+        dlib.rectangle(int(f.left() / scale), int(f.top() / scale), int(f.right() / scale), int(f.bottom() / scale))
+        for f in get_detector()(small, DETECTION_UPSAMPLE)
+    ]
+    
+    if DETECTION_VALIDATE:
+        validate_detection_scale(gray, faces)
+    
+    return faces
+
+def locate_faces(gray, state):
+    """
+    Find face rectangles in a grayscale frame
+    
+    Uses the correlation tracker while it is confident and a full detection is
+    not yet due, otherwise runs the HOG detector over the whole frame
+    """
+    if state.tracker is not None and state.frames_since_detection < DETECT_EVERY_N_FRAMES:
+        tracking_confidence = state.tracker.update(gray)
+        if tracking_confidence >= TRACKING_MIN_CONFIDENCE:
+            state.frames_since_detection += 1
+            pos = state.tracker.get_position()
+            return [dlib.rectangle(int(pos.left()), int(pos.top()), int(pos.right()), int(pos.bottom()))]
+        print(f"🔍 Tracking confidence dropped ({tracking_confidence:.1f}), re-detecting face")
+    
+    faces = detect_faces(gray, state.buffers)
+    state.tracker = None
+    state.frames_since_detection = 0
+    
+    # Only a single face (the driver) is tracked; several faces are re-detected every frame
+    if FACE_TRACKING and len(faces) == 1:
+        state.tracker = dlib.correlation_tracker()
+        state.tracker.start_track(gray, faces[0])
+    
+    return faces
 
 # Function to compute EAR (Eye Aspect Ratio)
 def eye_aspect_ratio(eye):
@@ -68,7 +262,19 @@ def eye_aspect_ratio(eye):
     return (A + B) / (2.0 * C)
 
 # Function to extract and preprocess eye image for the model
-def extract_eye_region(frame, eye_landmarks):
+def extract_eye_region(frame, eye_landmarks, out=None, crop_buffer=None):
+    """
+    Crop, resize and normalise one eye ROI for the eye state model
+    
+    Args:
+        frame: BGR frame
+        eye_landmarks: The six landmarks of the eye
+        out: Optional (1, 24, 24, 3) float32 slot of a preallocated batch to fill
+        crop_buffer: Optional (24, 24, 3) uint8 buffer to resize into
+        
+    Returns:
+        np.ndarray of shape (1, 24, 24, 3), or None if the region is unusable
+    """
     try:
         # Get bounding box of eye
         x_min = int(min(point[0] for point in eye_landmarks))
@@ -94,15 +300,15 @@ def extract_eye_region(frame, eye_landmarks):
             print("⚠️ Empty eye region")
             return None
             
-        # Resize to expected model input size
-        eye_region = cv2.resize(eye_region, EYE_IMG_SIZE)
+        # Resize to expected model input size, into the stream's reusable crop buffer
+        eye_region = cv2.resize(eye_region, EYE_IMG_SIZE, dst=crop_buffer)
         
-        # Keep as RGB (3 channels) as the model expects it
-        # Just normalize the values to 0-1 range
-        eye_region = eye_region.astype(np.float32) / 255.0
-        
-        # Add batch dimension
-        eye_region = np.expand_dims(eye_region, axis=0)
+        # Keep as 3 channels as the model expects it
+        # Just normalize the values to 0-1 range (with a batch dimension)
+        if out is None:
+            out = np.empty((1,) + eye_region.shape, dtype=np.float32)
+        np.multiply(eye_region, 1.0 / 255.0, out=out[0], casting='unsafe')
+        eye_region = out
         
         # Debug output
         print(f"Processed eye region shape: {eye_region.shape}")
@@ -112,6 +318,23 @@ def extract_eye_region(frame, eye_landmarks):
         print(f"⚠️ Error extracting eye region: {e}")
         return None
 
+def predict_eye_batch(eye_batch):
+    """
+    Run the eye state model once over a stacked batch of eye crops
+    
+    Args:
+        eye_batch: float32 array of shape (N, 24, 24, 3)
+        
+    Returns:
+        np.ndarray of N open-eye probabilities, or None if inference failed
+    """
+    try:
+        # Compiled tf.function path - avoids Keras predict() overhead on every call
+        return inference.infer(eye_batch)
+    except Exception as model_err:
+        print(f"⚠️ Error during model prediction: {model_err}")
+        return None
+
 def predict_eye_state(frame, left_eye_landmarks, right_eye_landmarks):
     """
     Use eye state model to predict if eyes are open or closed
@@ -142,33 +365,20 @@ def predict_eye_state(frame, left_eye_landmarks, right_eye_landmarks):
         # Debug input shape
         print(f"Model input shape: {left_eye_img.shape}")
         
-        # Predict eye state (0=closed, 1=open)
-        # Use model.predict with less verbosity
-        try:
-            # Less verbose prediction
-            left_pred = eye_model.predict(left_eye_img, verbose=0)
-            right_pred = eye_model.predict(right_eye_img, verbose=0)
-        except Exception as model_err:
-            print(f"⚠️ Error during model prediction: {model_err}")
-            # Try one more time with different approach
-            try:
-                # Try calling model directly
-                left_pred = eye_model(left_eye_img, training=False).numpy()
-                right_pred = eye_model(right_eye_img, training=False).numpy()
-            except Exception as call_err:
-                print(f"⚠️ Direct model call also failed: {call_err}")
-                # Fall back to EAR
-                left_ear = eye_aspect_ratio(left_eye_landmarks)
-                right_ear = eye_aspect_ratio(right_eye_landmarks)
-                ear = (left_ear + right_ear) / 2.0
-                return ear < EAR_THRESHOLD, ear
-        
-        # Debug raw predictions
-        print(f"Predictions - Left: {left_pred.flatten()[0]:.3f}, Right: {right_pred.flatten()[0]:.3f}")
+        # Predict eye state (0=closed, 1=open) for both eyes in one forward pass
+        preds = predict_eye_batch(np.concatenate([left_eye_img, right_eye_img]))
+        if preds is None:
+            # Fall back to EAR
+            left_ear = eye_aspect_ratio(left_eye_landmarks)
+            right_ear = eye_aspect_ratio(right_eye_landmarks)
+            ear = (left_ear + right_ear) / 2.0
+            return ear < EAR_THRESHOLD, ear
         
         # Extract prediction value based on model output shape
-        left_val = left_pred.flatten()[0]
-        right_val = right_pred.flatten()[0]
+        left_val, right_val = preds[0], preds[1]
+        
+        # Debug raw predictions
+        print(f"Predictions - Left: {left_val:.3f}, Right: {right_val:.3f}")
             
         # Average confidence (closer to 0 means more closed)
         avg_conf = (left_val + right_val) / 2.0
@@ -190,43 +400,111 @@ def predict_eye_state(frame, left_eye_landmarks, right_eye_landmarks):
         ear = (left_ear + right_ear) / 2.0
         return ear < EAR_THRESHOLD, ear
 
-def process_frame(data, log_drowsiness_callback):
+def process_frame(data, log_drowsiness_callback, state):
     """
     Process a frame to detect drowsiness
     
     Args:
         data: Base64 encoded image data
         log_drowsiness_callback: Callback function to log drowsiness event
+        state: DetectorState of the stream this frame belongs to
         
     Returns:
         dict: Status of drowsiness detection
     """
-    global frame_count, alert_active, alert_start_time, drowsiness_start_time
-    
     if not data:
         return {"drowsy": False}
 
-    # Convert Base64 image to OpenCV format
+    # Base64 string to JPEG bytes, then the shared decoder
     try:
         img_data = base64.b64decode(data)
-        img = Image.open(io.BytesIO(img_data))
-        frame = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
     except Exception as e:
         print(f"⚠️ Error processing image: {e}")
         return {"drowsy": False}
 
-    # Detect faces
-    faces = detector(gray)
+    return process_frame_bytes(img_data, log_drowsiness_callback, state)
+
+def decode_frame(data, buffers):
+    """
+    Decode JPEG bytes once into the gray image used for detection and landmarks
+    
+    With the eye model off, the JPEG is decoded straight to grayscale. With it on,
+    the whole frame is decoded to a newly allocated BGR array (imdecode can't
+    decode into an existing buffer), which the eye crops are cut from, and
+    converted into the stream's reusable gray buffer
+    
+    Returns:
+        tuple: (frame or None, gray)
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if not use_eye_model:
+        gray = cv2.imdecode(buf, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise ValueError("Could not decode JPEG frame")
+        return None, gray
+    
+    frame = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Could not decode JPEG frame")
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=buffers.gray_like(frame))
+    return frame, gray
+
+def process_frame_bytes(data, log_drowsiness_callback, state):
+    """
+    Process a raw JPEG frame (binary Socket.IO attachment) to detect drowsiness
+    
+    Args:
+        data: JPEG encoded image bytes
+        log_drowsiness_callback: Callback function to log drowsiness event
+        state: DetectorState of the stream this frame belongs to
+        
+    Returns:
+        dict: Status of drowsiness detection
+    """
+    if not data:
+        return {"drowsy": False}
+
+    # Models are still loading in the background
+    if not is_ready():
+        return {"drowsy": False, "ready": False}
+
+    try:
+        frame, gray = decode_frame(data, state.buffers)
+    except Exception as e:
+        print(f"⚠️ Error processing image: {e}")
+        return {"drowsy": False}
+
+    return analyze_frame(frame, gray, log_drowsiness_callback, state)
+
+def analyze_frame(frame, gray, log_drowsiness_callback, state):
+    """
+    Run face detection, eye state classification and alerting on a decoded frame
+    
+    Args:
+        frame: BGR image used for eye model crops (may be None when the model is off)
+        gray: Grayscale image used for detection and landmarks
+        log_drowsiness_callback: Callback function to log drowsiness event
+        state: DetectorState of the stream this frame belongs to
+        
+    Returns:
+        dict: Status of drowsiness detection
+    """
+    # Detect (or track) faces
+    faces = locate_faces(gray, state)
     print(f"🧐 Faces detected: {len(faces)}")
 
     if len(faces) == 0:
-        frame_count = 0  # Reset count when no face detected
+        state.frame_count = 0  # Reset count when no face detected
         return {"drowsy": False}
 
     # Store eye confidence for UI feedback
     confidence = 0.0
     
+    # Locate landmarks and write eye crops for every face straight into the
+    # stream's preallocated batch, so the model runs once per frame
+    face_eyes = []
+    eye_batch = state.buffers.eye_batch_for(2 * len(faces))
+    crop_count = 0
     for face in faces:
         landmarks = predictor(gray, face)
         landmarks = np.array([(p.x, p.y) for p in landmarks.parts()])
@@ -234,52 +512,57 @@ def process_frame(data, log_drowsiness_callback):
         left_eye = landmarks[LEFT_EYE]
         right_eye = landmarks[RIGHT_EYE]
         
+        # Index of this face's left eye crop in the batch (None if not usable)
+        crop_index = None
+        if use_eye_model and frame is not None:
+            left_eye_img = extract_eye_region(frame, left_eye, eye_batch[crop_count:crop_count + 1], state.buffers.eye_crop)
+            right_eye_img = extract_eye_region(frame, right_eye, eye_batch[crop_count + 1:crop_count + 2], state.buffers.eye_crop)
+            
+            # Unusable pairs are simply overwritten by the next face
+            if left_eye_img is not None and right_eye_img is not None:
+                crop_index = crop_count
+                crop_count += 2
+        
+        face_eyes.append((left_eye, right_eye, crop_index))
+    
+    # Single batched forward pass over all (N, 24, 24, 3) eye crops
+    eye_preds = None
+    if crop_count:
+        eye_preds = predict_eye_batch(eye_batch[:crop_count])
+    
+    for left_eye, right_eye, crop_index in face_eyes:
         # Variable to track if eyes are closed
         eyes_closed = False
         ear = 0.0
         
         # If we're using the AI model
         if use_eye_model:
-            # Extract eye regions for prediction
-            left_eye_img = extract_eye_region(frame, left_eye)
-            right_eye_img = extract_eye_region(frame, right_eye)
-            
-            if left_eye_img is not None and right_eye_img is not None:
-                try:
-                    # Get predictions (0-1 where 1 is open eyes)
-                    left_pred = eye_model.predict(left_eye_img, verbose=0).flatten()[0]
-                    right_pred = eye_model.predict(right_eye_img, verbose=0).flatten()[0]
-                    
-                    # Calculate ear for logging
-                    left_ear = eye_aspect_ratio(left_eye)
-                    right_ear = eye_aspect_ratio(right_eye)
-                    ear = (left_ear + right_ear) / 2.0
-                    
-                    print(f"Predictions - Left: {left_pred:.3f}, Right: {right_pred:.3f}")
-                    
-                    # More sensitive detection: consider eyes closed if either eye prediction is below 0.7
-                    eyes_closed = left_pred < 0.7 or right_pred < 0.7
-                    
-                    # Calculate confidence for UI display
-                    if eyes_closed:
-                        # Average of how closed both eyes are
-                        confidence = 1.0 - ((left_pred + right_pred) / 2.0)
-                    else:
-                        # Average of how open both eyes are
-                        confidence = (left_pred + right_pred) / 2.0
-                        
-                    print(f"👁 AI Model - Eyes {'closed' if eyes_closed else 'open'} (threshold: 0.7, confidence: {confidence:.2f})")
+            if crop_index is not None and eye_preds is not None:
+                # Get predictions (0-1 where 1 is open eyes)
+                left_pred = eye_preds[crop_index]
+                right_pred = eye_preds[crop_index + 1]
+                
+                # Calculate ear for logging
+                left_ear = eye_aspect_ratio(left_eye)
+                right_ear = eye_aspect_ratio(right_eye)
+                ear = (left_ear + right_ear) / 2.0
+                
+                print(f"Predictions - Left: {left_pred:.3f}, Right: {right_pred:.3f}")
+                
+                # More sensitive detection: consider eyes closed if either eye prediction is below 0.7
+                eyes_closed = left_pred < 0.7 or right_pred < 0.7
+                
+                # Calculate confidence for UI display
+                if eyes_closed:
+                    # Average of how closed both eyes are
+                    confidence = 1.0 - ((left_pred + right_pred) / 2.0)
+                else:
+                    # Average of how open both eyes are
+                    confidence = (left_pred + right_pred) / 2.0
                     
-                except Exception as e:
-                    print(f"⚠️ Error in model prediction: {e}")
-                    # Fall back to EAR
-                    left_ear = eye_aspect_ratio(left_eye)
-                    right_ear = eye_aspect_ratio(right_eye)
-                    ear = (left_ear + right_ear) / 2.0
-                    eyes_closed = ear < EAR_THRESHOLD
-                    confidence = 0.5  # Neutral confidence on error
+                print(f"👁 AI Model - Eyes {'closed' if eyes_closed else 'open'} (threshold: 0.7, confidence: {confidence:.2f})")
             else:
-                # Fall back to EAR if eye regions couldn't be extracted
+                # Fall back to EAR if eye regions couldn't be extracted or the model failed
                 left_ear = eye_aspect_ratio(left_eye)
                 right_ear = eye_aspect_ratio(right_eye)
                 ear = (left_ear + right_ear) / 2.0
@@ -303,44 +586,48 @@ def process_frame(data, log_drowsiness_callback):
             print(f"👁 EAR method: {ear:.2f} (threshold: {EAR_THRESHOLD})")
 
         if eyes_closed:
-            frame_count += 1
-            print(f"⏳ Drowsy frame count: {frame_count}/{CLOSED_FRAMES}")
-
-            if frame_count >= CLOSED_FRAMES:
-                if not alert_active:
-                    drowsiness_start_time = time.time()  # Record start time of drowsiness
-                    alert_active = True
-                    alert_start_time = time.time()  # Store time when alert starts
+            state.frame_count += 1
+            print(f"⏳ Drowsy frame count: {state.frame_count}/{CLOSED_FRAMES}")
+
+            if state.frame_count >= CLOSED_FRAMES:
+                if not state.alert_active:
+                    state.drowsiness_start_time = time.time()  # Record start time of drowsiness
+                    state.alert_active = True
+                    state.alert_start_time = time.time()  # Store time when alert starts
                     print("🚨 Drowsiness Detected! Playing Alert Sound...")
                     
                     try:
-                        pygame.mixer.music.stop()  # Stop previous sound before playing again
-                        pygame.mixer.music.play(-1)  # -1 means loop indefinitely
+                        play_alert_sound()
                     except Exception as e:
                         print(f"⚠️ Error playing sound: {e}")
 
         else:
             # If drowsiness ends, log the event and stop the alert
-            if alert_active:
-                duration = time.time() - drowsiness_start_time
+            if state.alert_active:
+                duration = time.time() - state.drowsiness_start_time
                 log_drowsiness_callback(ear, duration)
-                alert_active = False
-                pygame.mixer.music.stop()
+                state.alert_active = False
+                stop_alert_sound()
                 print("✅ Eyes opened, stopping alert.")
                 
-            frame_count = 0  # Reset counter
+            state.frame_count = 0  # Reset counter
 
     # Return drowsiness status and confidence
     return {
-        "drowsy": alert_active,
+        "drowsy": state.alert_active,
         "confidence": round(confidence * 100) / 100,  # Round to 2 decimal places
         "using_model": use_eye_model
     }
 
-def stop_alert():
-    """Stop the alert sound if it's playing"""
-    global alert_active
-    if alert_active:
-        alert_active = False
-        pygame.mixer.music.stop()
-        print("🔇 Stopping alert sound") 
\ No newline at end of file
+def set_eye_model(enabled):
+    """Switch between the eye state model and the EAR method (the model only once loaded)"""
+    global use_eye_model
+    use_eye_model = bool(enabled) and inference.is_loaded()
+    return use_eye_model
+
+def stop_alert(state):
+    """Stop the alert sound if it's playing for this stream"""
+    if state is not None and state.alert_active:
+        state.alert_active = False
+        stop_alert_sound()
+        print("🔇 Stopping alert sound")
@@ -0,0 +1,39 @@
+import os
+
+# Where frames are processed: "thread" runs detection on a pool of OS threads
+# (eventlet.tpool) so the green-thread hub keeps serving sockets and HTTP requests,
+# "inline" runs it directly on the hub
+DETECTION_POOL = os.environ.get('DETECTION_POOL', 'thread').lower()
+DETECTION_THREADS = int(os.environ.get('DETECTION_THREADS', 4))
+
+if DETECTION_POOL == 'thread':
+    from eventlet import tpool
+    tpool.set_num_threads(DETECTION_THREADS)
+    print(f"🧵 Detection worker pool: {DETECTION_THREADS} OS threads")
+
+def run_frame(process, data, state):
+    """
+    Run a detection frame processor off the event loop
+
+    Drowsiness events are collected instead of logged from the worker thread, so the
+    caller can write them from the hub
+
+    Args:
+        process: detection.process_frame or detection.process_frame_bytes
+        data: Frame payload for the processor
+        state: DetectorState of the stream
+
+    Returns:
+        tuple: (result dict, list of (ear_value, duration_seconds) events)
+    """
+    events = []
+
+    def collect_event(ear_value, duration_seconds):
+        events.append((ear_value, duration_seconds))
+
+    if DETECTION_POOL == 'thread':
+        result = tpool.execute(process, data, collect_event, state)
+    else:
+        result = process(data, collect_event, state)
+
+    return result, events
@@ -0,0 +1,244 @@
+import os
+import sys
+import hmac
+import zlib
+import atexit
+import pickle
+import socket
+import struct
+import secrets
+import subprocess
+
+# Number of detection worker processes (0 = detect inside the server process)
+# Each worker has its own dlib predictor and eye model, and every connection is
+# pinned to one worker by its sid, so its detector state stays in that process
+DETECTION_WORKERS = int(os.environ.get('DETECTION_WORKERS', 0))
+
+# Length-prefixed pickle messages over a localhost socket
+_HEADER = struct.Struct('!I')
+
+# Handshake sent raw before any pickle: the auth token, the worker index and
+# whether its models loaded
+TOKEN_BYTES = 16
+_HANDSHAKE = struct.Struct(f'!{TOKEN_BYTES * 2}sI?')
+# Seconds a connecting process gets to send its handshake
+HANDSHAKE_TIMEOUT = 5.0
+
+def send_message(sock, obj):
+    """Send one message to the other end of a worker connection"""
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+def _recv_exact(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("Detection worker connection closed")
+        buf += chunk
+    return bytes(buf)
+
+def recv_message(sock):
+    """Receive one message from the other end of a worker connection"""
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return pickle.loads(_recv_exact(sock, size))
+
+class DetectionWorker:
+    """Server-side handle on one detection worker process"""
+    __slots__ = ('index', 'process', 'sock', 'ready', 'lock')
+
+    def __init__(self, index, process, sock, ready):
+        from eventlet.semaphore import Semaphore
+
+        self.index = index
+        self.process = process
+        self.sock = sock
+        self.ready = ready  # False if the worker failed to load its models
+        self.lock = Semaphore(1)  # One request in flight per worker connection
+
+    def call(self, message):
+        """Send a request and wait (green, without blocking the hub) for the reply"""
+        with self.lock:
+            send_message(self.sock, message)
+            return recv_message(self.sock)
+
+# Connected workers by index, filled in as they finish loading their models
+workers = {}
+_processes = []
+
+# Eye model setting last applied to the workers (they start with it on, if it loads)
+eye_model_enabled = True
+
+def enabled():
+    """Check whether sharded detection workers are configured"""
+    return DETECTION_WORKERS > 0
+
+def start_workers(count=DETECTION_WORKERS):
+    """
+    Spawn the detection worker processes and wait for them to connect back
+
+    Meant to run as a background task: workers take a while to load their models
+    and frames for a worker that is not connected yet are answered with "not ready"
+    """
+    token = secrets.token_hex(TOKEN_BYTES)
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(count)
+    host, port = server.getsockname()
+
+    # Workers get the auth token through their environment, never on the command line
+    env = dict(os.environ, DETECTION_WORKER_TOKEN=token, DETECTION_WORKERS='0')
+    for index in range(count):
+        _processes.append(subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), host, str(port), str(index)], env=env
+        ))
+    atexit.register(stop_workers)
+    print(f"🏭 Started {count} detection worker processes")
+
+    try:
+        while len(workers) < count:
+            sock, _ = server.accept()
+            # Check the token before unpickling anything from this connection,
+            # and don't let a silent client hold up the accept loop
+            sock.settimeout(HANDSHAKE_TIMEOUT)
+            try:
+                worker_token, index, ready = _HANDSHAKE.unpack(_recv_exact(sock, _HANDSHAKE.size))
+            except OSError as e:
+                print(f"⚠️ Rejected detection worker connection: {e}")
+                sock.close()
+                continue
+            if not hmac.compare_digest(worker_token, token.encode()) or not 0 <= index < count:
+                print("⚠️ Rejected detection worker connection with a bad token")
+                sock.close()
+                continue
+            sock.settimeout(None)
+            workers[index] = DetectionWorker(index, _processes[index], sock, ready)
+            if not eye_model_enabled:
+                workers[index].call(('set_model', None, None, None, False))
+            if ready:
+                print(f"✅ Detection worker {index} ready ({len(workers)}/{count})")
+            else:
+                print(f"❌ Detection worker {index} failed to load its models ({len(workers)}/{count})")
+    finally:
+        server.close()
+
+def stop_workers():
+    """Terminate all detection worker processes"""
+    for process in _processes:
+        if process.poll() is None:
+            process.terminate()
+
+def readiness():
+    """Readiness of the worker pool for /api/ready - only warm workers count"""
+    warm = sum(1 for worker in list(workers.values()) if worker.ready)
+    return {
+        "ready": warm == DETECTION_WORKERS,
+        "workers": warm,
+        "connected_workers": len(workers),
+        "expected_workers": DETECTION_WORKERS
+    }
+
+def worker_for(sid):
+    """Get the worker a connection is pinned to, or None if it is not connected"""
+    return workers.get(zlib.crc32(sid.encode()) % DETECTION_WORKERS)
+
+def _call(sid, message):
+    worker = worker_for(sid)
+    if worker is None:
+        return None
+    try:
+        return worker.call(message)
+    except Exception as e:
+        print(f"❌ Detection worker {worker.index} failed: {e}")
+        workers.pop(worker.index, None)
+        return None
+
+def run_frame(sid, session_id, process_name, data):
+    """
+    Process a frame on the connection's worker
+
+    Args:
+        sid: Socket.IO sid of the connection
+        session_id: Current session ID (a new session resets the stream's state)
+        process_name: "process_frame" (base64) or "process_frame_bytes" (raw JPEG)
+        data: Frame payload
+
+    Returns:
+        tuple: (result dict, list of (ear_value, duration_seconds) events)
+    """
+    reply = _call(sid, ('frame', sid, session_id, process_name, data))
+    if reply is None:
+        return {"drowsy": False, "ready": False}, []
+    return reply
+
+def set_eye_model(enabled):
+    """
+    Switch every connected worker between the eye state model and the EAR method
+
+    Returns:
+        dict: Whether each worker (by index) now uses the model - a worker without
+        a loaded model stays on EAR
+    """
+    global eye_model_enabled
+
+    states = {}
+    for worker in list(workers.values()):
+        try:
+            states[worker.index] = worker.call(('set_model', None, None, None, enabled))
+        except Exception as e:
+            print(f"❌ Detection worker {worker.index} failed: {e}")
+            workers.pop(worker.index, None)
+    eye_model_enabled = any(states.values())
+    return states
+
+def stop_alert(sid):
+    """Stop the alert of a connection's stream on its worker"""
+    _call(sid, ('stop_alert', sid, None, None, None))
+
+def drop_stream(sid):
+    """Forget a disconnected connection's detector state on its worker"""
+    _call(sid, ('drop', sid, None, None, None))
+
+def worker_main(host, port, index):
+    """Detection worker process: serve frame requests from the server process"""
+    import detection
+
+    # Connect once loading is done and report whether it worked; a worker that
+    # failed still answers frames with "not ready" instead of leaving its sids unserved
+    ready = detection.load_models()
+
+    sock = socket.create_connection((host, port))
+    sock.sendall(_HANDSHAKE.pack(os.environ['DETECTION_WORKER_TOKEN'].encode(), index, bool(ready)))
+
+    # Detector state per sid of the connections pinned to this worker
+    states = {}
+
+    while True:
+        try:
+            action, sid, session_id, process_name, data = recv_message(sock)
+        except ConnectionError:
+            break
+
+        if action == 'drop':
+            detection.stop_alert(states.pop(sid, None))
+            send_message(sock, None)
+        elif action == 'stop_alert':
+            detection.stop_alert(states.get(sid))
+            send_message(sock, None)
+        elif action == 'set_model':
+            send_message(sock, detection.set_eye_model(data))
+        else:
+            state = detection.get_stream_state(states, sid, session_id)
+            events = []
+            try:
+                process = getattr(detection, process_name)
+                result = process(data, lambda ear, duration: events.append((ear, duration)), state)
+            except Exception as e:
+                print(f"❌ Worker {index} error processing frame: {e}")
+                result = {"drowsy": False}
+            send_message(sock, (result, events))
+
+    sock.close()
+
+if __name__ == '__main__':
+    worker_main(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]))
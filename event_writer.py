@@ -0,0 +1,70 @@
+import os
+import atexit
+import threading
+
+# Flush queued rows once this many are waiting, or after this many seconds
+EVENT_BATCH_SIZE = int(os.environ.get('EVENT_BATCH_SIZE', 50))
+EVENT_FLUSH_INTERVAL = float(os.environ.get('EVENT_FLUSH_INTERVAL', 1.0))
+
+class EventWriter:
+    """
+    Background writer that queues rows and hands them to `write_batch` in batches
+
+    submit() only appends to an in-memory list, so callers on the frame path never
+    wait for the database or the disk. A background thread flushes on a size or time
+    threshold; flush() writes everything queued so far before returning
+    """
+
+    def __init__(self, write_batch, batch_size=EVENT_BATCH_SIZE, flush_interval=EVENT_FLUSH_INTERVAL):
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._pending_lock = threading.Lock()  # Guards the queue only - held very briefly
+        self._write_lock = threading.Lock()    # Serialises batch writes
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopped = False
+
+    def submit(self, row):
+        """Queue one row for writing"""
+        with self._pending_lock:
+            self._pending.append(row)
+            pending = len(self._pending)
+
+        if self._thread is None:
+            self._start()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write every queued row now; returns once they are committed"""
+        with self._write_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if batch:
+                self.write_batch(batch)
+            return len(batch)
+
+    def stop(self):
+        """Stop the background thread and write whatever is still queued"""
+        self._stopped = True
+        self._wakeup.set()
+        self.flush()
+
+    def _start(self):
+        with self._pending_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Error flushing queued events: {e}")
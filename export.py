@@ -0,0 +1,152 @@
+import io
+import csv
+import json
+import time
+import zlib
+import db
+
+# Optional dependency - Parquet export is only offered when pyarrow is installed
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Rows fetched from the cursor and written out per chunk
+EXPORT_CHUNK_ROWS = 1000
+
+EXPORT_COLUMNS = ('id', 'timestamp', 'ear_value', 'duration_seconds', 'session_id')
+CSV_HEADERS = ["ID", "Timestamp", "EAR Value", "Duration (s)", "Session ID"]
+
+def iter_event_chunks(days=7, start_date=None, end_date=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yield lists of event rows from a server-side cursor, newest first
+
+    Only one chunk is held in memory at a time, and the pooled connection goes
+    back to the pool as soon as the generator finishes or is closed
+    """
+    where, params = db.event_filters(days, start_date, end_date)
+    with db.get_connection() as conn:
+        cursor = conn.execute(
+            f"SELECT {', '.join(EXPORT_COLUMNS)} FROM drowsiness_events WHERE {where} ORDER BY timestamp DESC, id DESC",
+            params
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield rows
+            # Give other green threads a turn between chunks (time.sleep is patched by eventlet)
+            time.sleep(0)
+
+def csv_stream(chunks):
+    """Encode row chunks as CSV, header first"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADERS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def ndjson_stream(chunks):
+    """Encode row chunks as newline-delimited JSON objects"""
+    for rows in chunks:
+        yield "".join(json.dumps(dict(row)) + "\n" for row in rows).encode()
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def parquet_stream(chunks):
+    """Encode row chunks as a Parquet file, one row group per chunk"""
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('timestamp', pa.string()),
+        ('ear_value', pa.float64()),
+        ('duration_seconds', pa.float64()),
+        ('session_id', pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def gzip_stream(stream):
+    """Gzip-compress a byte stream chunk by chunk"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for data in stream:
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+# Export formats: name -> (stream encoder, mimetype, file extension)
+FORMATS = {
+    'csv': (csv_stream, "text/csv", "csv"),
+    'ndjson': (ndjson_stream, "application/x-ndjson", "ndjson"),
+}
+if pa is not None:
+    FORMATS['parquet'] = (parquet_stream, "application/vnd.apache.parquet", "parquet")
+
+def export_events(fmt='csv', days=7, start_date=None, end_date=None, compress=False):
+    """
+    Build a streaming export of drowsiness events
+
+    Args:
+        fmt: One of FORMATS ("csv", "ndjson" and, with pyarrow, "parquet")
+        days, start_date, end_date: Date window, as for db.event_filters
+        compress: Gzip the stream (ignored for Parquet, which compresses itself)
+
+    Returns:
+        tuple: (byte chunk generator, mimetype, file extension)
+
+    Raises:
+        ValueError: For an unsupported format
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}' (expected one of {', '.join(FORMATS)})")
+
+    encode, mimetype, extension = FORMATS[fmt]
+    stream = encode(iter_event_chunks(days, start_date, end_date))
+    if compress and fmt != 'parquet':
+        return gzip_stream(stream), "application/gzip", extension + ".gz"
+    return stream, mimetype, extension
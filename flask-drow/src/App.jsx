@@ -201,9 +201,16 @@ const DrowsinessDetection = () => {
     canvas.height = 240;
     ctx.drawImage(videoRef.current, 0, 0, 320, 240);
 
-    const frameData = canvas.toDataURL("image/jpeg", 0.6);
-    const base64Data = frameData.split(",")[1];
-    socket.emit("send_frame", base64Data);
+    // Send raw JPEG bytes as a binary attachment (no base64 inflation)
+    canvas.toBlob(
+      async (blob) => {
+        if (!blob) return;
+        const buffer = await blob.arrayBuffer();
+        socket.emit("send_frame_bin", buffer);
+      },
+      "image/jpeg",
+      0.6
+    );
   };
 
   useEffect(() => {
@@ -9,6 +9,9 @@ import { useAuth } from "../contexts/AuthContext";
 import { getAuthHeader } from "../utils/auth";
 import io from "socket.io-client";
 
+// Events per /api/events request - the server's largest page (EVENTS_MAX_LIMIT)
+const EVENTS_PAGE_LIMIT = 5000;
+
 // Create logout button component
 const LogoutButton = () => {
   const navigate = useNavigate();
@@ -43,6 +46,24 @@ const Logs = () => {
   const runtimeTimerRef = useRef(null);
   const lastServerRuntimeRef = useRef(0);
   const lastUpdateTimeRef = useRef(Date.now());
+  // Latest values for the timer and socket callbacks, which outlive a render
+  const sessionActiveRef = useRef(false);
+  const activeSessionIdRef = useRef(null);
+  const activeFilterRef = useRef(1);
+  const logsRef = useRef([]);
+  const logsRangeRef = useRef(null); // Custom date range of the loaded logs, null for "last N days"
+
+  useEffect(() => {
+    sessionActiveRef.current = sessionActive;
+  }, [sessionActive]);
+
+  useEffect(() => {
+    activeFilterRef.current = activeFilter;
+  }, [activeFilter]);
+
+  useEffect(() => {
+    logsRef.current = logs;
+  }, [logs]);
 
   // Define display constants at component level
   const DISPLAY_ALERT_DURATION = 1; // 1 second per alert for display in UI
@@ -78,7 +99,7 @@ const Logs = () => {
 
     // Start a new timer that updates every 100ms
     runtimeTimerRef.current = setInterval(() => {
-      if (sessionActive) {
+      if (sessionActiveRef.current) {
         // Calculate elapsed time since last server update
         const now = Date.now();
         const elapsed = (now - lastUpdateTimeRef.current) / 1000;
@@ -171,16 +192,14 @@ const Logs = () => {
     return Math.max(0, totalTime - drowsyTime);
   };
 
-  // Fetch logs data
-  const fetchLogs = async (days = 1, start = null, end = null) => {
-    setIsLoading(true);
-    try {
-      let url = `/api/events?days=${days}`;
-
-      if (start && end) {
-        const formattedStart = format(start, "yyyy-MM-dd");
-        const formattedEnd = format(end, "yyyy-MM-dd");
-        url = `/api/events?start_date=${formattedStart}&end_date=${formattedEnd}`;
+  // Fetch every page of an /api/events query, following next_cursor to the end
+  const fetchAllEvents = async (query) => {
+    const events = [];
+    let cursor = null;
+    do {
+      let url = `/api/events?${query}&limit=${EVENTS_PAGE_LIMIT}`;
+      if (cursor) {
+        url += `&cursor=${encodeURIComponent(cursor)}`;
       }
 
       console.log("Fetching logs from:", url);
@@ -206,12 +225,31 @@ const Logs = () => {
       }
 
       const data = await response.json();
-      console.log("Received log data:", data);
+      events.push(...(data.events || []));
+      cursor = data.next_cursor;
+    } while (cursor);
+
+    return events;
+  };
 
-      if (data.events) {
-        setLogs(data.events);
+  // Fetch logs data
+  const fetchLogs = async (days = 1, start = null, end = null) => {
+    setIsLoading(true);
+    try {
+      let query = `days=${days}`;
+      logsRangeRef.current = null;
+
+      if (start && end) {
+        const formattedStart = format(start, "yyyy-MM-dd");
+        const formattedEnd = format(end, "yyyy-MM-dd");
+        query = `start_date=${formattedStart}&end_date=${formattedEnd}`;
+        logsRangeRef.current = { query, start: formattedStart, end: formattedEnd };
       }
 
+      const events = await fetchAllEvents(query);
+      console.log(`Received ${events.length} log entries`);
+      setLogs(events);
+
       // Also fetch sessions to get camera runtime
       fetchSessions();
     } catch (error) {
@@ -221,6 +259,30 @@ const Logs = () => {
     }
   };
 
+  // Fetch only events newer than the ones already loaded (since_id)
+  const fetchNewLogs = async (days = 1) => {
+    const range = logsRangeRef.current;
+    const lastId = logsRef.current.reduce((max, log) => Math.max(max, log.id), 0);
+    if (lastId === 0 && !range) {
+      return fetchLogs(days);
+    }
+
+    try {
+      const query = range ? range.query : `days=${days}`;
+      const events = await fetchAllEvents(`${query}&since_id=${lastId}`);
+      console.log(`Received ${events.length} new log entries`);
+
+      setLogs((prevLogs) => {
+        const known = new Set(prevLogs.map((log) => log.id));
+        return [...events.filter((event) => !known.has(event.id)), ...prevLogs];
+      });
+
+      fetchSessions();
+    } catch (error) {
+      console.error("Error fetching new logs:", error);
+    }
+  };
+
   // Fetch session data to get accurate camera runtime
   const fetchSessions = async () => {
     try {
@@ -312,26 +374,10 @@ const Logs = () => {
     fetchActiveSessionRuntime();
     setActiveFilter(1); // Set default active filter to "Today"
 
-    // Start the smooth runtime timer
+    // Start the smooth runtime timer - later updates arrive over the socket
     startRuntimeTimer();
 
-    // Set up periodic refresh every 2 seconds for active runtime
-    const runtimeInterval = setInterval(() => {
-      fetchActiveSessionRuntime();
-    }, 2000); // More frequent updates for runtime
-
-    // Set up periodic refresh every 10 seconds for stats and logs
-    const dataInterval = setInterval(() => {
-      console.log("Refreshing stats and logs data...");
-      fetchLogs(activeFilter); // Use the active filter period
-      fetchStats();
-      fetchSessions();
-    }, 10000); // Less frequent for full data refresh
-
     return () => {
-      clearInterval(runtimeInterval);
-      clearInterval(dataInterval);
-
       // Clear runtime timer on unmount
       if (runtimeTimerRef.current) {
         clearInterval(runtimeTimerRef.current);
@@ -339,87 +385,172 @@ const Logs = () => {
     };
   }, []);
 
-  // Listen for socket events for real-time updates
+  // Catch up over HTTP after a reconnect
+  const refreshAll = () => {
+    console.log("Refreshing stats and logs data...");
+    fetchNewLogs(activeFilterRef.current); // Also refreshes sessions
+    fetchStats();
+    fetchActiveSessionRuntime();
+  };
+
+  // Apply a database change delta pushed by the server
+  const applyDashboardUpdate = (update) => {
+    const today = format(new Date(), "yyyy-MM-dd");
+    const isToday = (timestamp) => !!timestamp && timestamp.slice(0, 10) === today;
+    const sumDuration = (events) =>
+      events.reduce((total, event) => total + (event.duration_seconds || 0), 0);
+
+    switch (update.type) {
+      case "events_added": {
+        const events = update.events || [];
+        if (events.length === 0) break;
+        const todaysEvents = events.filter((event) => isToday(event.timestamp));
+
+        setStats((prevStats) => {
+          const totalEvents = (prevStats.overall.total_events || 0) + events.length;
+          const totalDuration =
+            (prevStats.overall.total_duration || 0) + sumDuration(events);
+          return {
+            ...prevStats,
+            overall: {
+              ...prevStats.overall,
+              total_events: totalEvents,
+              total_duration: totalDuration,
+              avg_duration: totalEvents > 0 ? totalDuration / totalEvents : 0,
+              first_event: prevStats.overall.first_event || events[0].timestamp,
+              last_event: events[events.length - 1].timestamp,
+            },
+            today: {
+              ...prevStats.today,
+              events: (prevStats.today.events || 0) + todaysEvents.length,
+              duration: (prevStats.today.duration || 0) + sumDuration(todaysEvents),
+            },
+          };
+        });
+
+        // Newest first, like /api/events - a "last N days" window always includes
+        // new events, a custom date range only those that fall inside it
+        const range = logsRangeRef.current;
+        const inRange = range
+          ? events.filter(
+              (event) => event.timestamp >= range.start && event.timestamp <= range.end
+            )
+          : events;
+        if (inRange.length > 0) {
+          setLogs((prevLogs) => {
+            const known = new Set(prevLogs.map((log) => log.id));
+            const added = inRange.filter((event) => !known.has(event.id)).reverse();
+            return [...added, ...prevLogs];
+          });
+        }
+
+        setSessions((prevSessions) =>
+          prevSessions.map((session) => {
+            const sessionEvents = events.filter(
+              (event) => event.session_id === session.id
+            );
+            if (sessionEvents.length === 0) return session;
+            return {
+              ...session,
+              total_events: (session.total_events || 0) + sessionEvents.length,
+              total_duration_seconds:
+                (session.total_duration_seconds || 0) + sumDuration(sessionEvents),
+              event_count: (session.event_count || 0) + sessionEvents.length,
+            };
+          })
+        );
+        break;
+      }
+
+      case "session_started":
+        setSessions((prevSessions) => [
+          update.session,
+          ...prevSessions.filter((session) => session.id !== update.session.id),
+        ]);
+        activeSessionIdRef.current = update.session.id;
+        setSessionActive(true);
+        updateRuntimeFromServer(0);
+        break;
+
+      case "session_ended":
+        setSessions((prevSessions) =>
+          prevSessions.map((session) =>
+            session.id === update.session_id
+              ? { ...session, end_time: update.end_time, duration: update.duration }
+              : session
+          )
+        );
+        if (isToday(update.start_time)) {
+          setStats((prevStats) => ({
+            ...prevStats,
+            today: {
+              ...prevStats.today,
+              session_time:
+                (parseFloat(prevStats.today.session_time) || 0) +
+                (update.duration || 0),
+            },
+          }));
+        }
+        if (
+          !activeSessionIdRef.current ||
+          activeSessionIdRef.current === update.session_id
+        ) {
+          activeSessionIdRef.current = null;
+          setSessionActive(false);
+          lastServerRuntimeRef.current = 0;
+          setActiveSessionRuntime(0); // Clear active session runtime
+        }
+        break;
+
+      case "reset":
+        // Rows were deleted, so reload the whole window rather than new rows only
+        fetchLogs(activeFilterRef.current);
+        fetchStats();
+        fetchActiveSessionRuntime();
+        break;
+
+      default:
+        console.warn("Unknown dashboard update:", update);
+    }
+  };
+
+  // Listen for socket events for real-time updates instead of polling
   useEffect(() => {
-    // Setup socket listener for stats updates
     const socket = io();
+    let hasConnected = false;
 
     socket.on("connect", () => {
       console.log("Socket connected");
-    });
 
-    socket.on("disconnect", () => {
-      console.log("Socket disconnected");
-    });
+      // Subscribe to database change deltas
+      socket.emit("join_dashboard", getAuthHeader(), (response) => {
+        if (!response || !response.joined) {
+          console.error("Could not join dashboard updates:", response);
+        }
+      });
 
-    socket.on("stats_updated", (newStats) => {
-      console.log("Received stats update from server:", newStats);
-      setStats(newStats);
-      fetchActiveSessionRuntime();
+      // Deltas sent while disconnected are lost - reload once on reconnect
+      if (hasConnected) {
+        refreshAll();
+      }
+      hasConnected = true;
     });
 
-    socket.on("session_ended", (sessionData) => {
-      console.log("Session ended:", sessionData);
-      // Refresh data when a session ends
-      fetchStats();
-      fetchSessions();
-      setSessionActive(false);
-      lastServerRuntimeRef.current = 0;
-      setActiveSessionRuntime(0); // Clear active session runtime
+    socket.on("disconnect", () => {
+      console.log("Socket disconnected");
     });
 
-    socket.on("session_started", (sessionData) => {
-      console.log("Session started, refreshing stats:", sessionData);
-      // Refresh data when a new session starts
-      fetchStats();
-      fetchSessions();
-      setSessionActive(true);
-      fetchActiveSessionRuntime(); // Get the new active session runtime
+    socket.on("dashboard_update", (update) => {
+      console.log("Received dashboard update:", update.type);
+      applyDashboardUpdate(update);
     });
 
     return () => {
-      socket.off("stats_updated");
-      socket.off("session_ended");
-      socket.off("session_started");
+      socket.off("dashboard_update");
       socket.disconnect();
     };
   }, []);
 
-  // Set up refresh timers for runtime and data
-  useEffect(() => {
-    console.log("Setting up refresh timers");
-
-    // Start the smooth runtime timer
-    startRuntimeTimer();
-
-    // Set up periodic refresh every 2 seconds for active runtime
-    const runtimeInterval = setInterval(() => {
-      if (sessionActive) {
-        console.log("Refreshing active runtime data...");
-        fetchActiveSessionRuntime();
-      }
-    }, 5000); // Less frequent server checks (5 seconds)
-
-    // Set up periodic refresh every 10 seconds for stats and logs
-    const dataInterval = setInterval(() => {
-      console.log("Refreshing stats and logs data...");
-      fetchLogs(activeFilter); // Use the active filter period
-      fetchStats();
-      fetchSessions();
-    }, 15000); // Less frequent for full data refresh (15 seconds)
-
-    return () => {
-      console.log("Cleaning up timers");
-      clearInterval(runtimeInterval);
-      clearInterval(dataInterval);
-
-      // Clear runtime timer on unmount
-      if (runtimeTimerRef.current) {
-        clearInterval(runtimeTimerRef.current);
-      }
-    };
-  }, []);
-
   // Get active session runtime directly from the backend
   const getActiveSessionRuntime = async () => {
     try {
@@ -434,6 +565,7 @@ const Logs = () => {
 
       if (data.active && typeof data.runtime === "number") {
         // Set session as active
+        activeSessionIdRef.current = data.session_id || null;
         setSessionActive(true);
 
         // Update the runtime from server (this updates our reference values)
@@ -453,6 +585,7 @@ const Logs = () => {
         return data.runtime;
       } else {
         console.log("No active session found or invalid runtime");
+        activeSessionIdRef.current = null;
         setSessionActive(false);
         lastServerRuntimeRef.current = 0;
 
@@ -18,6 +18,8 @@ export const login = async (username, password) => {
   const data = await response.json();
   localStorage.setItem("user", JSON.stringify(data.user));
   localStorage.setItem("username", data.user.username);
+  localStorage.setItem("token", data.token);
+  localStorage.setItem("tokenExpiresAt", String(data.expires_at));
 
   // Reset logs data after successful login
   try {
@@ -26,7 +28,7 @@ export const login = async (username, password) => {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
-        Authorization: data.user.username,
+        Authorization: `Bearer ${data.token}`,
       },
     });
 
@@ -64,19 +66,37 @@ export const register = async (username, password) => {
 
 // Logout function
 export const logout = () => {
+  // Revoke the token on the server - local state is cleared either way
+  const headers = getAuthHeader();
+  if (headers.Authorization) {
+    fetch("/api/logout", { method: "POST", headers }).catch((error) =>
+      console.error("Error revoking token:", error)
+    );
+  }
+
   localStorage.removeItem("user");
   localStorage.removeItem("username");
+  localStorage.removeItem("token");
+  localStorage.removeItem("tokenExpiresAt");
+};
+
+// Get the stored token, or null if there is none or it has expired
+export const getToken = () => {
+  const token = localStorage.getItem("token");
+  const expiresAt = Number(localStorage.getItem("tokenExpiresAt"));
+  if (!token || !expiresAt || expiresAt * 1000 <= Date.now()) return null;
+  return token;
 };
 
 // Check if user is authenticated
 export const isAuthenticated = () => {
-  return localStorage.getItem("user") !== null;
+  return localStorage.getItem("user") !== null && getToken() !== null;
 };
 
 // Get current user
 export const getCurrentUser = () => {
   const userString = localStorage.getItem("user");
-  if (!userString) return null;
+  if (!userString || !getToken()) return null;
 
   try {
     return JSON.parse(userString);
@@ -88,11 +108,11 @@ export const getCurrentUser = () => {
 
 // Get auth header
 export const getAuthHeader = () => {
-  const user = getCurrentUser();
-  if (!user) return {};
+  const token = getToken();
+  if (!token) return {};
 
   return {
-    Authorization: user.username,
+    Authorization: `Bearer ${token}`,
   };
 };
 
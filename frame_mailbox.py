@@ -0,0 +1,30 @@
+import time
+
+class FrameMailbox:
+    """
+    Single-slot, latest-frame-wins mailbox for one connection's frames
+
+    A new frame replaces any frame that is still waiting, so detection always works
+    on the newest image instead of a growing backlog of stale ones
+    """
+    __slots__ = ('pending', 'seq', 'dropped', 'busy')
+
+    def __init__(self):
+        self.pending = None  # (seq, received_at, process, data) waiting to be processed
+        self.seq = 0         # Sequence number of the last received frame
+        self.dropped = 0     # Frames replaced before they were processed
+        self.busy = False    # A drain loop is running for this mailbox
+
+    def put(self, process, data):
+        """Store a frame, dropping the one still pending. Returns its sequence number"""
+        self.seq += 1
+        if self.pending is not None:
+            self.dropped += 1
+        self.pending = (self.seq, time.time(), process, data)
+        return self.seq
+
+    def take(self):
+        """Remove and return the pending frame, or None if there is nothing to process"""
+        item = self.pending
+        self.pending = None
+        return item
@@ -0,0 +1,215 @@
+import os
+import sys
+import threading
+import time
+import tempfile
+import numpy as np
+
+# Eye state model input (height, width, channels)
+EYE_INPUT_SHAPE = (24, 24, 3)
+MODEL_PATH = os.path.join(os.getcwd(), "eye_state_model.h5")
+
+# Inference backend: "keras" (compiled tf.function), "tflite" or "onnx"
+# The lightweight backends convert the .h5 model once and cache the artifact next to it
+BACKEND = os.environ.get('EYE_MODEL_BACKEND', 'keras').lower()
+
+# Active backend name and its inference function
+backend_name = None
+_infer_fn = None
+
+def _load_keras_model(model_path):
+    """Load the Keras model - only this path (and conversion) imports TensorFlow"""
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path, compile=False)
+    print(f"🧠 Loaded Keras model: {model.count_params()} parameters")
+    return model
+
+def _load_keras(model_path):
+    """Keras backend: the model wrapped in a traced tf.function"""
+    import tensorflow as tf
+
+    model = _load_keras_model(model_path)
+
+    # Fixed input signature (any batch size) so the graph is traced exactly once
+    @tf.function(input_signature=[tf.TensorSpec((None,) + EYE_INPUT_SHAPE, tf.float32)])
+    def serve(batch):
+        return model(batch, training=False)
+
+    def run(batch):
+        return serve(tf.convert_to_tensor(batch)).numpy()
+
+    return run
+
+def _write_artifact(path, write):
+    """
+    Write a converted model through `write(temp_path)`, then move it into place
+
+    Several worker processes may convert at once; os.replace swaps the finished
+    file in atomically, so a loader never sees a half-written artifact
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        write(temp_path)
+        os.chmod(temp_path, 0o644)  # mkstemp creates owner-only files
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def convert_to_tflite(model_path, tflite_path):
+    """Convert the Keras model into a TFLite flatbuffer"""
+    import tensorflow as tf
+
+    print(f"🔄 Converting {model_path} to TFLite...")
+    converter = tf.lite.TFLiteConverter.from_keras_model(_load_keras_model(model_path))
+    flatbuffer = converter.convert()
+
+    def write(temp_path):
+        with open(temp_path, "wb") as f:
+            f.write(flatbuffer)
+
+    _write_artifact(tflite_path, write)
+    print(f"✅ Saved TFLite model to: {tflite_path}")
+
+def _load_tflite(model_path):
+    """TFLite backend: the converted flatbuffer run through the TFLite interpreter"""
+    tflite_path = os.path.splitext(model_path)[0] + ".tflite"
+    if not os.path.exists(tflite_path):
+        convert_to_tflite(model_path, tflite_path)
+
+    # Prefer the standalone runtime so TensorFlow never gets imported
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+
+    # Interpreters are not thread-safe - keep one per worker thread
+    interpreters = {}
+
+    def run(batch):
+        interpreter = interpreters.get(threading.get_ident())
+        if interpreter is None:
+            interpreter = interpreters[threading.get_ident()] = Interpreter(model_path=tflite_path)
+            interpreter.allocate_tensors()
+        input_index = interpreter.get_input_details()[0]['index']
+        output_index = interpreter.get_output_details()[0]['index']
+
+        # Re-allocate only when the batch size changes
+        if tuple(interpreter.get_input_details()[0]['shape']) != batch.shape:
+            interpreter.resize_tensor_input(input_index, batch.shape)
+            interpreter.allocate_tensors()
+        interpreter.set_tensor(input_index, batch)
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index)
+
+    return run
+
+def convert_to_onnx(model_path, onnx_path):
+    """Convert the Keras model into an ONNX graph (requires tf2onnx)"""
+    import tensorflow as tf
+    import tf2onnx
+
+    print(f"🔄 Converting {model_path} to ONNX...")
+    spec = (tf.TensorSpec((None,) + EYE_INPUT_SHAPE, tf.float32, name="input"),)
+    model = _load_keras_model(model_path)
+    _write_artifact(onnx_path, lambda temp_path: tf2onnx.convert.from_keras(
+        model, input_signature=spec, output_path=temp_path
+    ))
+    print(f"✅ Saved ONNX model to: {onnx_path}")
+
+def _load_onnx(model_path):
+    """ONNX backend: the converted graph run through ONNX Runtime on CPU"""
+    import onnxruntime as ort
+
+    onnx_path = os.path.splitext(model_path)[0] + ".onnx"
+    if not os.path.exists(onnx_path):
+        convert_to_onnx(model_path, onnx_path)
+
+    session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+
+    def run(batch):
+        return session.run(None, {input_name: batch})[0]
+
+    return run
+
+# Available backends, keyed by EYE_MODEL_BACKEND value
+BACKENDS = {
+    'keras': _load_keras,
+    'tflite': _load_tflite,
+    'onnx': _load_onnx,
+}
+
+def load_engine(model_path=MODEL_PATH, backend=None):
+    """
+    Load the eye state model once into the configured inference backend
+
+    Args:
+        model_path: Path to the Keras .h5 model file
+        backend: Backend name, defaults to EYE_MODEL_BACKEND
+
+    Returns:
+        bool: True if the engine is ready to serve infer() calls
+    """
+    global backend_name, _infer_fn
+
+    backend = backend or BACKEND
+    try:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend '{backend}' (expected one of {', '.join(BACKENDS)})")
+
+        print(f"Loading model from: {model_path} (backend: {backend})")
+        _infer_fn = BACKENDS[backend](model_path)
+        backend_name = backend
+        warmup()
+
+        print(f"🧠 Eye state inference engine ready! ({backend})")
+        return True
+    except Exception as e:
+        print(f"⚠️ Error loading eye state model: {e}")
+        backend_name = None
+        _infer_fn = None
+        return False
+
+def warmup(batch_size=2):
+    """Trace the graph and initialise kernels before the first real frame arrives"""
+    start = time.perf_counter()
+    infer(np.zeros((batch_size,) + EYE_INPUT_SHAPE, dtype=np.float32))
+    print(f"🔥 Inference engine warmed up in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+def is_loaded():
+    """Check whether the engine has a loaded backend"""
+    return _infer_fn is not None
+
+def infer(batch):
+    """
+    Run the loaded backend over a batch of eye crops
+
+    Args:
+        batch: Array of shape (N, 24, 24, 3) with values in the 0-1 range
+
+    Returns:
+        np.ndarray: N open-eye probabilities (0=closed, 1=open)
+    """
+    if _infer_fn is None:
+        raise RuntimeError("Inference engine not loaded")
+
+    batch = np.ascontiguousarray(batch, dtype=np.float32)
+    preds = np.asarray(_infer_fn(batch))
+
+    # One probability per crop regardless of the model's output shape
+    return preds.reshape(len(batch), -1)[:, 0]
+
+if __name__ == '__main__':
+    # Pre-build the lightweight artifacts, e.g. `python inference.py tflite`
+    target = sys.argv[1] if len(sys.argv) > 1 else 'tflite'
+    if target == 'tflite':
+        convert_to_tflite(MODEL_PATH, os.path.splitext(MODEL_PATH)[0] + ".tflite")
+    elif target == 'onnx':
+        convert_to_onnx(MODEL_PATH, os.path.splitext(MODEL_PATH)[0] + ".onnx")
+    else:
+        print(f"Usage: python {os.path.basename(__file__)} [tflite|onnx]")
@@ -0,0 +1,104 @@
+import os
+import hmac
+import hashlib
+import secrets
+
+# Eventlet is optional here so the benchmark can run without it
+try:
+    from eventlet import tpool
+except ImportError:
+    tpool = None
+
+# Password hashing: "scrypt" (memory-hard, default) or "pbkdf2" (PBKDF2-HMAC-SHA256)
+PASSWORD_HASH_ALGORITHM = os.environ.get('PASSWORD_HASH_ALGORITHM', 'scrypt').lower()
+# scrypt cost: CPU/memory cost N (power of 2), block size r and parallelism p
+# Memory per hash is about 128 * N * r bytes (16 MiB with the defaults)
+SCRYPT_N = int(os.environ.get('SCRYPT_N', 2 ** 14))
+SCRYPT_R = int(os.environ.get('SCRYPT_R', 8))
+SCRYPT_P = int(os.environ.get('SCRYPT_P', 1))
+# PBKDF2-HMAC-SHA256 iteration count
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', 600000))
+
+def current_params(algorithm=None):
+    """Cost parameters of the configured (or given) algorithm"""
+    algorithm = algorithm or PASSWORD_HASH_ALGORITHM
+    if algorithm == 'scrypt':
+        return (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    if algorithm == 'pbkdf2':
+        return (PBKDF2_ITERATIONS,)
+    raise ValueError(f"Unknown password hash algorithm '{algorithm}' (expected scrypt or pbkdf2)")
+
+def derive(password, salt, algorithm, params):
+    """Derive the hex digest of a password - CPU bound, runs on the calling thread"""
+    if algorithm == 'scrypt':
+        n, r, p = params
+        return hashlib.scrypt(
+            password.encode(), salt=salt.encode(), n=n, r=r, p=p,
+            maxmem=256 * n * r * p + 1024 * 1024, dklen=32
+        ).hex()
+    if algorithm == 'pbkdf2':
+        (iterations,) = params
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations).hex()
+    if algorithm == 'sha256':
+        # Legacy single salted SHA-256, only ever verified
+        return hashlib.sha256((password + salt).encode()).hexdigest()
+    raise ValueError(f"Unknown password hash algorithm '{algorithm}'")
+
+def parse_hash(encoded):
+    """
+    Split a stored hash into (algorithm, params, digest)
+
+    New hashes are stored as "algorithm$param,...$digest"; a bare hex digest is a
+    legacy salted SHA-256 hash
+    """
+    if '$' not in encoded:
+        return 'sha256', (), encoded
+    algorithm, params, digest = encoded.split('$')
+    return algorithm, tuple(int(param) for param in params.split(',')), digest
+
+def hash_password_sync(password, algorithm=None, params=None):
+    """Hash a password with a new salt on the calling thread; returns (encoded hash, salt)"""
+    algorithm = algorithm or PASSWORD_HASH_ALGORITHM
+    params = params or current_params(algorithm)
+    salt = secrets.token_hex(16)
+    digest = derive(password, salt, algorithm, params)
+    return f"{algorithm}${','.join(str(param) for param in params)}${digest}", salt
+
+def verify_password_sync(password, encoded, salt):
+    """Check a password against a stored hash on the calling thread (constant-time compare)"""
+    try:
+        algorithm, params, digest = parse_hash(encoded)
+        return hmac.compare_digest(derive(password, salt, algorithm, params), digest)
+    except (ValueError, TypeError):
+        return False
+
+def off_hub(fn, *args):
+    """Run CPU-bound hashing on eventlet's OS thread pool so the hub keeps serving requests"""
+    if tpool is not None:
+        return tpool.execute(fn, *args)
+    return fn(*args)
+
+def hash_password(password):
+    """Hash a password with the configured algorithm and cost; returns (encoded hash, salt)"""
+    return off_hub(hash_password_sync, password)
+
+def verify_password(password, encoded, salt):
+    """Check a password against a stored hash of any supported algorithm"""
+    return off_hub(verify_password_sync, password, encoded, salt)
+
+def needs_rehash(encoded):
+    """Check whether a stored hash is legacy or uses other than the configured cost"""
+    try:
+        algorithm, params, _ = parse_hash(encoded)
+    except ValueError:
+        return True
+    return algorithm != PASSWORD_HASH_ALGORITHM or params != current_params()
+
+# Verified when the username doesn't exist, so unknown users take as long as wrong passwords
+_DUMMY_SALT = secrets.token_hex(16)
+_DUMMY_HASH = f"{PASSWORD_HASH_ALGORITHM}${','.join(str(param) for param in current_params())}${'0' * 64}"
+
+def verify_dummy(password):
+    """Spend the same time as a real verification, always failing"""
+    verify_password(password, _DUMMY_HASH, _DUMMY_SALT)
+    return False
@@ -1,11 +1,10 @@
-from flask import jsonify, request, Response, render_template
-import io
-import csv
+from flask import jsonify, request, Response, render_template, stream_with_context
 from datetime import datetime, timedelta
 
 # Import from other modules
 from auth import require_auth
 import db
+import export
 
 def register_routes(app):
     @app.route('/')
@@ -26,7 +25,16 @@ def register_routes(app):
                 "message": str(e)
             }), 500
 
-    # Route to serve API for export to CSV
+    # Readiness probe - no auth required; 503 until detection is warm
+    @app.route('/api/ready')
+    def ready():
+        import detection
+        import detection_workers
+        
+        status = detection_workers.readiness() if detection_workers.enabled() else dict(detection.load_status)
+        return jsonify(status), 200 if status["ready"] else 503
+
+    # Route to stream an export of the events (CSV by default)
     @app.route('/api/export-csv')
     @require_auth
     def export_csv():
@@ -34,35 +42,24 @@ def register_routes(app):
             days = request.args.get('days', default=7, type=int)
             start_date = request.args.get('start_date', default=None)
             end_date = request.args.get('end_date', default=None)
+            fmt = request.args.get('format', default='csv').lower()
+            compress = request.args.get('gzip', default='0').lower() in ('1', 'true', 'yes')
             
-            events = db.get_events(days, start_date, end_date)
-            
-            if not events:
+            # Cheap existence check instead of loading the whole window
+            if not db.get_events_page(days, start_date, end_date, limit=1, fields=('id',))['events']:
                 return jsonify({"error": "No data found"}), 404
-                
-            # Create CSV content
-            output = io.StringIO()
-            headers = ["ID", "Timestamp", "EAR Value", "Duration (s)", "Session ID"]
-            csv_writer = csv.writer(output)
-            csv_writer.writerow(headers)
             
-            for event in events:
-                csv_writer.writerow([
-                    event['id'],
-                    event['timestamp'],
-                    event['ear_value'],
-                    event['duration_seconds'],
-                    event['session_id']
-                ])
-                
-            response = Response(
-                output.getvalue(),
-                mimetype="text/csv",
-                headers={"Content-Disposition": f"attachment;filename=drowsiness_logs_{datetime.now().strftime('%Y-%m-%d')}.csv"}
-            )
+            stream, mimetype, extension = export.export_events(fmt, days, start_date, end_date, compress)
             
-            return response
+            # Rows are streamed in chunks (chunked transfer encoding), never held in full
+            return Response(
+                stream_with_context(stream),
+                mimetype=mimetype,
+                headers={"Content-Disposition": f"attachment;filename=drowsiness_logs_{datetime.now().strftime('%Y-%m-%d')}.{extension}"}
+            )
         
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
@@ -88,7 +85,7 @@ def register_routes(app):
 
     @app.route('/api/login', methods=['POST'])
     def login():
-        from auth import login_user
+        from auth import login_user, issue_token
         
         data = request.get_json()
         
@@ -103,7 +100,18 @@ def register_routes(app):
         if error:
             return jsonify({'message': error}), 401
         
-        return jsonify({'message': 'Login successful', 'user': user})
+        # Signed token for the Authorization: Bearer header
+        token, expires_at = issue_token(user)
+        
+        return jsonify({'message': 'Login successful', 'user': user, 'token': token, 'expires_at': expires_at})
+
+    @app.route('/api/logout', methods=['POST'])
+    @require_auth
+    def logout():
+        from auth import revoke_token, token_from_header
+        
+        revoke_token(token_from_header(request.headers.get('Authorization')))
+        return jsonify({'message': 'Logged out'})
 
     # Protect these routes with authentication
     @app.route('/api/events', methods=['GET'])
@@ -114,19 +122,47 @@ def register_routes(app):
             days = request.args.get('days', default=7, type=int)
             start_date = request.args.get('start_date', default=None)
             end_date = request.args.get('end_date', default=None)
+            limit = request.args.get('limit', default=500, type=int)
+            cursor = request.args.get('cursor', default=None)
+            since_id = request.args.get('since_id', default=None, type=int)
+            fields = request.args.get('fields', default=None)
+            fields = tuple(field.strip() for field in fields.split(',') if field.strip()) if fields else None
             
-            print(f"📋 Fetching events with parameters: days={days}, start_date={start_date}, end_date={end_date}")
+            print(f"📋 Fetching events with parameters: days={days}, start_date={start_date}, end_date={end_date}, limit={limit}, since_id={since_id}")
             
-            events = db.get_events(days, start_date, end_date)
+            page = db.get_events_page(days, start_date, end_date, limit=limit, cursor=cursor, since_id=since_id, fields=fields)
             
-            print(f"🔢 Events found: {len(events)}")
+            print(f"🔢 Events found: {len(page['events'])}{' (more pages)' if page['next_cursor'] else ''}")
             
-            return jsonify({"events": events})
+            return jsonify(page)
         
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             print(f"❌ Error fetching events: {e}")
             return jsonify({"error": str(e)}), 500
 
+    @app.route('/api/events/aggregate', methods=['GET'])
+    @require_auth
+    def aggregate_events():
+        try:
+            bucket = request.args.get('bucket', default='1h')
+            start = request.args.get('from', default=None)
+            end = request.args.get('to', default=None)
+            session_id = request.args.get('session_id', default=None)
+            
+            result = db.aggregate_events(bucket, start, end, session_id)
+            if result is None:
+                return jsonify({"error": "Failed to aggregate events"}), 500
+            
+            return jsonify(result)
+        
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            print(f"❌ Error aggregating events: {e}")
+            return jsonify({"error": str(e)}), 500
+
     @app.route('/api/events/add', methods=['POST'])
     @require_auth
     def add_event():
@@ -189,7 +225,7 @@ def register_routes(app):
             if not session_id:
                 return jsonify({'error': 'No active session to end'}), 400
             
-            db.end_session(session_id)
+            summary = db.end_session(session_id)
             app.config['CURRENT_SESSION_ID'] = ''  # Clear the session ID
             
             # Get stats to return updated info
@@ -198,6 +234,7 @@ def register_routes(app):
             return jsonify({
                 'message': 'Session ended successfully',
                 'session_id': session_id,
+                'session': summary,
                 'stats': stats
             })
         except Exception as e:
@@ -233,8 +270,9 @@ def register_routes(app):
             print(f"📊 Active session runtime: {runtime:.2f}s")
             
             # Get today's totals including previous completed sessions
+            # (copied - the stats dict is shared through the query cache)
             stats = db.get_stats()
-            today_stats = stats.get('today', {})
+            today_stats = dict(stats.get('today', {}))
             
             # Always make sure session_time is a number
             if 'session_time' in today_stats and today_stats['session_time'] is not None:
@@ -273,9 +311,22 @@ def register_routes(app):
     def toggle_detection_model():
         try:
             import detection
+            import detection_workers
+            
+            # Frames are classified in the worker processes - switch all of them
+            if detection_workers.enabled():
+                states = detection_workers.set_eye_model(not detection_workers.eye_model_enabled)
+                if not states:
+                    return jsonify({'error': 'Detection workers are not connected yet'}), 503
+                
+                return jsonify({
+                    'use_eye_model': detection_workers.eye_model_enabled,
+                    'workers': {str(index): state for index, state in sorted(states.items())},
+                    'message': f"Now using {'eye state model' if detection_workers.eye_model_enabled else 'traditional EAR method'}"
+                })
             
-            # Toggle the use_eye_model flag
-            detection.use_eye_model = not detection.use_eye_model
+            # Toggle the use_eye_model flag (only on if the engine has loaded)
+            detection.set_eye_model(not detection.use_eye_model)
             
             return jsonify({
                 'use_eye_model': detection.use_eye_model,
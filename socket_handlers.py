@@ -1,23 +1,108 @@
+import time
+from flask import request
+from flask_socketio import join_room, leave_room
 import db
+from auth import authenticate
 import detection
+import detection_pool
+import detection_workers
+from frame_mailbox import FrameMailbox
+
+# Detector state per Socket.IO connection (sid), so concurrent streams don't share counters
+detector_states = {}
+
+# Latest-frame-wins mailbox per Socket.IO connection (sid)
+frame_mailboxes = {}
+
+# Room of the Logs dashboards that receive database change deltas
+DASHBOARD_ROOM = 'dashboard'
 
 def register_socket_handlers(socketio, app):
     """Register all Socket.IO event handlers"""
     
+    def push_dashboard_update(kind, payload):
+        """Forward a committed database change to the dashboards as a compact delta"""
+        socketio.emit('dashboard_update', dict(payload, type=kind), to=DASHBOARD_ROOM)
+    
+    db.add_change_listener(push_dashboard_update)
+    
+    def drain_mailbox(sid, mailbox):
+        """Process the newest pending frame of a connection until its mailbox is empty"""
+        try:
+            while True:
+                # Let queued send_frame events land first, so stale frames get replaced
+                socketio.sleep(0)
+                # Stop once the connection is gone - processing another frame would
+                # recreate detector state (here or on its worker) that nothing removes
+                if frame_mailboxes.get(sid) is not mailbox:
+                    break
+                item = mailbox.take()
+                if item is None:
+                    break
+                seq, received_at, process, data = item
+                
+                current_session_id = app.config.get('CURRENT_SESSION_ID', '')
+                
+                # Process the frame and detect drowsiness on this connection's detection
+                # worker process, or on the local thread pool
+                if detection_workers.enabled():
+                    result, events = detection_workers.run_frame(sid, current_session_id, process.__name__, data)
+                else:
+                    state = detection.get_stream_state(detector_states, sid, current_session_id)
+                    result, events = detection_pool.run_frame(process, data, state)
+                
+                # Log drowsiness events from the hub
+                for ear_value, duration_seconds in events:
+                    db.log_drowsiness_event(ear_value, duration_seconds, current_session_id)
+                result['seq'] = seq
+                result['latency_ms'] = round((time.time() - received_at) * 1000, 1)
+                result['dropped_frames'] = mailbox.dropped
+                
+                # Send the result back to the client that sent the frame
+                socketio.emit('detection_result', result, to=sid)
+        except Exception as e:
+            print(f"❌ Error processing frame for {sid}: {e}")
+        finally:
+            mailbox.busy = False
+    
+    def run_detection(process, data):
+        """Queue a frame for the calling connection, starting its drain loop if idle"""
+        sid = request.sid
+        mailbox = frame_mailboxes.get(sid)
+        if mailbox is None:
+            mailbox = frame_mailboxes[sid] = FrameMailbox()
+        
+        mailbox.put(process, data)
+        if not mailbox.busy:
+            mailbox.busy = True
+            socketio.start_background_task(drain_mailbox, sid, mailbox)
+    
     @socketio.on('send_frame')
     def handle_frame(data):
-        """Handle incoming frame data for drowsiness detection"""
-        
-        def log_drowsiness(ear_value, duration_seconds):
-            """Callback to log drowsiness events"""
-            current_session_id = app.config.get('CURRENT_SESSION_ID', '')
-            db.log_drowsiness_event(ear_value, duration_seconds, current_session_id)
-        
-        # Process the frame and detect drowsiness
-        result = detection.process_frame(data, log_drowsiness)
-        
-        # Send the result back to the client
-        socketio.emit('detection_result', result)
+        """Handle incoming base64 frame data for drowsiness detection"""
+        run_detection(detection.process_frame, data)
+    
+    @socketio.on('send_frame_bin')
+    def handle_frame_bin(data):
+        """Handle incoming raw JPEG bytes (binary attachment) for drowsiness detection"""
+        run_detection(detection.process_frame_bytes, data)
+    
+    @socketio.on('join_dashboard')
+    def join_dashboard(data):
+        """Subscribe an authenticated dashboard to database change deltas"""
+        try:
+            if not authenticate((data or {}).get('Authorization')):
+                return {'joined': False, 'message': 'Invalid authentication'}
+            join_room(DASHBOARD_ROOM)
+            return {'joined': True}
+        except Exception as e:
+            print(f"❌ Error joining dashboard: {e}")
+            return {'joined': False, 'message': str(e)}
+    
+    @socketio.on('leave_dashboard')
+    def leave_dashboard():
+        """Stop sending database change deltas to this connection"""
+        leave_room(DASHBOARD_ROOM)
     
     @socketio.on('connect')
     def handle_connect():
@@ -35,13 +120,18 @@ def register_socket_handlers(socketio, app):
     def handle_disconnect():
         """Handle client disconnect event - ensure current session is closed"""
         try:
+            # Retire the mailbox first, so its drain loop stops before the next frame
+            frame_mailboxes.pop(request.sid, None)
+            
             current_session_id = app.config.get('CURRENT_SESSION_ID', '')
             if current_session_id:
                 db.end_session(current_session_id)
                 print(f"Ending session on disconnect: {current_session_id}")
                 
-            # Stop alert sound if it's playing
-            detection.stop_alert()
+            # Stop alert sound if it's playing and drop this connection's detector state
+            detection.stop_alert(detector_states.pop(request.sid, None))
+            if detection_workers.enabled():
+                detection_workers.drop_stream(request.sid)
         except Exception as e:
             print(f"Error handling disconnect: {e}")
     
@@ -83,29 +173,22 @@ def register_socket_handlers(socketio, app):
                 # End the session when camera stops
                 current_session_id = app.config.get('CURRENT_SESSION_ID', '')
                 if current_session_id:
-                    # Ensure end time is set
-                    db.end_session(current_session_id)
+                    # Ensure end time is set - one transaction returns the whole summary
+                    summary = db.end_session(current_session_id) or {}
                     print(f"✅ Ended camera session: {current_session_id}")
                     app.config['CAMERA_ACTIVE'] = False
                     
-                    # Send session info to client
-                    session_info = db.get_session_info(current_session_id)
-                    
-                    # Get total duration
-                    duration = session_info.get('duration', 0) if session_info else 0
-                    
                     # Send detailed session info including duration
+                    # (dashboards get their stats through the dashboard_update change feed)
                     socketio.emit('session_ended', {
                         'session_id': current_session_id,
-                        'duration': duration,
-                        'start_time': session_info.get('start_time') if session_info else None,
-                        'end_time': session_info.get('end_time') if session_info else None,
+                        'duration': summary.get('duration', 0),
+                        'start_time': summary.get('start_time'),
+                        'end_time': summary.get('end_time'),
+                        'event_count': summary.get('event_count', 0),
+                        'total_drowsy_time': summary.get('total_drowsy_time', 0),
                         'message': 'Session ended successfully'
                     })
-                    
-                    # Explicitly trigger a stats update
-                    stats = db.get_stats()
-                    socketio.emit('stats_updated', stats)
                 else:
                     print("⚠️ No active session to end")
                     socketio.emit('session_ended', {
@@ -114,7 +197,9 @@ def register_socket_handlers(socketio, app):
                     })
                 
                 # Stop alert sound if it's playing
-                detection.stop_alert()
+                detection.stop_alert(detector_states.get(request.sid))
+                if detection_workers.enabled():
+                    detection_workers.stop_alert(request.sid)
                 
         except Exception as e:
             print(f"❌ Error updating session: {e}")